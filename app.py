@@ -1,18 +1,44 @@
+import time
+_boot_started = time.perf_counter()
+
+import logging
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 import os
-import requests
-import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from dateutil import parser
 from dotenv import load_dotenv
-from transformers import pipeline
 import stock_data 
+import sentiment_engine
+import sentiment_cache
+import data_layer
+import http_client
+import price_history
+import price_store
+import return_correlation
+import lead_lag
+import metrics
+import stream_scraper
+import stream_store
+import stream_sync
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logger = logging.getLogger("dashboard")
 
 st.set_page_config(page_title="Market Analysis Dashboard", layout="wide", page_icon="📈")
 load_dotenv()
 
+@st.cache_resource
+def log_startup_timing():
+    # Runs once per server process, on the first script run after a (re)deploy.
+    logger.info("Dashboard imports took %.2fs", time.perf_counter() - _boot_started)
+    return True
+
+log_startup_timing()
+# Picks up edits to the sector universe file without restarting the server.
+stock_data.reload_if_changed()
+
 st.markdown("""
     <style>
     .css-15zrgzn {display: none}
@@ -37,187 +63,377 @@ def save_watchlist_to_file(current_list):
             f.write(f"{ticker}\n")
 
 @st.cache_resource
-def load_ai_model():
-    model_path = "./finetuned_stock_model"
+def get_metrics_writer():
+    # One writer per server process; rewrites metrics/dashboard.prom and
+    # metrics/dashboard_latest.json every minute while anything changes.
+    return metrics.ReportWriter("dashboard")
+
+get_metrics_writer()
+
+DASHBOARD_REQUESTS_PER_SECOND = float(os.getenv("DASHBOARD_REQUESTS_PER_SECOND", "20"))
+DASHBOARD_REQUEST_BURST = int(os.getenv("DASHBOARD_REQUEST_BURST", "16"))
+
+@st.cache_resource
+def configure_http_client():
+    # An analyst is waiting on every request here, so the dashboard paces
+    # itself close to its old per-request sleep rather than the scrapers' rate.
+    return http_client.configure(rate=DASHBOARD_REQUESTS_PER_SECOND, burst=DASHBOARD_REQUEST_BURST)
+
+configure_http_client()
+
+@st.cache_resource
+def get_model_warmup():
+    # Shared by every session; the model loads once in the background.
+    return sentiment_engine.ClassifierWarmup()
+
+model_warmup = get_model_warmup()
+
+@st.cache_resource
+def load_sentiment_cache():
     try:
-        classifier = pipeline("sentiment-analysis", model=model_path, tokenizer=model_path)
-        return classifier
+        return sentiment_cache.SentimentCache()
     except Exception as e:
-        st.error(f"Error loading model: {e}")
+        logger.warning("Sentiment cache disabled: %s", e)
         return None
 
-stock_classifier = load_ai_model()
+@st.cache_resource
+def load_stream_store():
+    return stream_store.StreamStore()
+
+PRICE_TTL_SECONDS = 3600
+SENTIMENT_TTL_SECONDS = 900
+
+@st.cache_resource
+def get_data_layer():
+    # Shared by every session: cached data is keyed by ticker and window,
+    # the token only decides who may read it.
+    return data_layer.SharedDataLayer()
+
+def auth_headers(token):
+    return {"Authorization": f"Bearer {token}", "User-Agent": "Mozilla/5.0"}
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def get_stock_price(ticker, days, user_token):
     base_url = os.getenv("TARGET_PRICE_URL") 
     
     if not user_token or not base_url:
         return pd.DataFrame()
 
-    headers = {"Authorization": f"Bearer {user_token}", "User-Agent": "Mozilla/5.0"}
     target_url = f"{base_url}/{ticker}"
-    
-    end_date_obj = datetime.now()
-    start_date_obj = end_date_obj - timedelta(days=days)
-    
-    all_price_data = []
-    curr_date = start_date_obj
-    
-    progress_text = "Fetching price history..."
-    my_bar = st.progress(0, text=progress_text)
-    total_days_range = (end_date_obj - start_date_obj).days
-    
-    try:
-        while curr_date < end_date_obj:
-            batch_end = min(curr_date + timedelta(days=30), end_date_obj)
-            
-            params = {
-                "period": "HS_PERIOD_DAILY",
-                "start_date": curr_date.strftime("%Y-%m-%d"),
-                "end_date": batch_end.strftime("%Y-%m-%d"),
-                "limit": 50,
-                "page": 1
-            }
-            
-            response = requests.get(target_url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                batch_result = response.json().get('data', {}).get('result', [])
-                if batch_result:
-                    all_price_data.extend(batch_result)
-            elif response.status_code == 401:
-                return pd.DataFrame() 
-            
-            curr_date = batch_end
-            
+
+    def load(token):
+        end_date_obj = datetime.now()
+        start_date_obj = end_date_obj - timedelta(days=days)
+        
+        progress_text = "Fetching price history..."
+        my_bar = st.progress(0, text=progress_text)
+        total_days_range = (end_date_obj - start_date_obj).days
+        latest_end = [start_date_obj]
+
+        def on_window(start, end, status_code, rows, error):
+            latest_end[0] = max(latest_end[0], end)
             if total_days_range > 0:
-                days_done = (curr_date - start_date_obj).days
+                days_done = (latest_end[0] - start_date_obj).days
                 percent = min(days_done / total_days_range, 1.0)
-                my_bar.progress(percent, text=f"Fetching prices: {curr_date.strftime('%Y-%m-%d')}...")
+                my_bar.progress(percent, text=f"Fetching prices: {latest_end[0].strftime('%Y-%m-%d')}...")
+
+        try:
+            with metrics.stage("dashboard_price"):
+                df, status_codes = price_store.refresh_prices(
+                    ticker, target_url, auth_headers(token), start_date_obj, end_date_obj, on_window=on_window
+                )
+        except Exception:
+            df, status_codes = pd.DataFrame(), []
+        
+        my_bar.empty()
 
-            time.sleep(0.05) 
-            
-    except Exception:
-        pass
-    
-    my_bar.empty()
-    
-    if all_price_data:
-        df = pd.DataFrame(all_price_data)
-        if 'date' in df.columns:
+        if not df.empty and 'date' in df.columns:
             df['date'] = pd.to_datetime(df['date'])
-            return df.drop_duplicates(subset=['date']).sort_values('date')
-            
-    return pd.DataFrame()
-
-@st.cache_data(ttl=900, show_spinner=False)
-def get_stock_sentiment(ticker, days, user_token):
+            df = df.drop_duplicates(subset=['date']).sort_values('date')
+        else:
+            df = pd.DataFrame()
+        return df, data_layer.authorization_from_status(status_codes)
+
+    def probe(token):
+        now = datetime.now()
+        status_code, _, _ = price_history.fetch_window(target_url, auth_headers(token), now - timedelta(days=1), now)
+        return data_layer.authorization_from_status([status_code])
+
+    df = get_data_layer().get(("price", ticker, days), user_token, load, PRICE_TTL_SECONDS, probe=probe)
+    return df if df is not None else pd.DataFrame()
+
+def get_stock_sentiment(ticker, days, user_token, layer, store, cache, model_ready=True, count_clusters_once=False):
+    """
+    Runs on the fetch pool (see submit_sentiment): the data layer, stream
+    store and sentiment cache are passed in, so nothing in here touches st.*.
+    """
     base_url = os.getenv("TARGET_STREAM_URL")
     
     if not user_token or not base_url:
         return None
 
-    headers = {"Authorization": f"Bearer {user_token}", "User-Agent": "Mozilla/5.0"}
     target_url = f"{base_url}/{ticker}"
-    
+
+    def sync(token):
+        with metrics.stage("dashboard_sentiment"):
+            outcome = sync_stock_stream(ticker, days, target_url, auth_headers(token), model_ready, store, cache)
+        return outcome, data_layer.authorization_from_status([outcome["status_code"]])
+
+    def probe(token):
+        try:
+            status_code, _, _ = stream_scraper.fetch_page(target_url, auth_headers(token))
+        except Exception:
+            return None
+        return data_layer.authorization_from_status([status_code])
+
+    # One fetch per ticker and window, whatever the caller's model state and
+    # counting mode; every variant is then aggregated from the store.
+    outcome = layer.get(("sentiment_sync", ticker, days), user_token, sync, SENTIMENT_TTL_SECONDS, probe=probe)
+    if outcome is None:
+        return None
+
+    def aggregate(token):
+        result = compute_stock_sentiment(ticker, days, model_ready, count_clusters_once, store, cache)
+        # Only cached for tokens upstream already accepted.
+        return result, layer.is_trusted(token) or None
+
+    # Keyed by the sync it was computed from, so a new fetch means a new aggregate.
+    key = ("sentiment", ticker, days, outcome["synced_at"], model_ready, count_clusters_once)
+    return layer.get(key, user_token, aggregate, SENTIMENT_TTL_SECONDS)
+
+def sync_stock_stream(ticker, days, target_url, headers, model_ready, store, cache):
+    """
+    Brings the stored stream of `ticker` up to date for the last `days`,
+    labeling new pages as they arrive once the model is ready. Returns the
+    walk's outcome, with "synced_at" added.
+    """
     cutoff_date = datetime.now() - timedelta(days=days)
-    
-    all_messages = []
-    current_cursor = None
-    max_loops = 20  
-    is_finished = False
 
-    progress_text = f"Analyzing sentiment for last {days} days..."
-    my_bar = st.progress(0, text=progress_text)
+    outcome = stream_sync.sync_ticker(
+        store, ticker, target_url, headers, cutoff_date,
+        classifier=model_warmup.classifier if model_ready else None, cache=cache
+    )
+    if outcome["malformed"]:
+        logger.warning("%s: skipped %d malformed messages", ticker, outcome["malformed"])
+    outcome["synced_at"] = time.time()
+    return outcome
+
+def compute_stock_sentiment(ticker, days, model_ready, count_clusters_once, store, cache):
+    """
+    Aggregates the stored window of `ticker`, first labeling any messages
+    that were saved before the model was ready. Returns the result or None.
+    """
+    cutoff_date = datetime.now() - timedelta(days=days)
+    if model_ready:
+        stream_sync.label_window(store, ticker, cutoff_date, model_warmup.classifier, cache=cache)
+    counts = stream_sync.window_counts(store, ticker, cutoff_date, count_clusters_once=count_clusters_once)
+    return sentiment_result(*counts)
+
+def sentiment_result(bullish, bearish, neutral):
+    total = bullish + bearish + neutral
+    if not total:
+        return None
+
+    stats = {"BULLISH": bullish, "BEARISH": bearish, "NEUTRAL": neutral}
+    dominant_key = max(stats, key=stats.get)
+    
+    dominant_label = dominant_key
+    if "BULLISH" in dominant_key: dominant_label += " 🚀"
+    elif "BEARISH" in dominant_key: dominant_label += " 🔻"
+    else: dominant_label += " 😐"
+    
+    return {
+        "total": total,
+        "stats": stats,
+        "dominant": dominant_label,
+        "bullish_pct": (bullish/total)*100
+    }
 
+@st.cache_resource
+def get_correlation_engine():
+    # Shared by every session; refreshed from the price store at most every REFRESH_SECONDS.
+    return return_correlation.CorrelationEngine()
+
+def pick_candidates(ticker, sector):
+    """
+    Candidates from other sectors with the lowest return correlation to
+    `ticker` plus the watchlist, topped up with random picks when there is
+    not enough stored price history. Returns (tickers, {ticker: correlation}).
+    """
+    watch = [ticker] + st.session_state.watchlist
+    engine = get_correlation_engine()
     try:
-        for i in range(max_loops):
-            if is_finished: break
-            
-            my_bar.progress(min((i + 1) / max_loops, 0.9), text=f"Scanning stream (Batch {i+1})...")
+        engine.refresh_if_stale()
+        ranked = engine.rank_candidates(watch, sector)
+    except Exception as e:
+        logger.warning("Correlation ranking unavailable: %s", e)
+        ranked = []
 
-            params = {"category": "STREAM_CATEGORY_ALL", "limit": 20}
-            if current_cursor:
-                params["last_stream_id"] = current_cursor
+    picks = [t for t, _ in ranked]
+    if len(picks) < 3:
+        picks += stock_data.get_diversification_candidates(sector, watch + picks, count=3 - len(picks))
+    return picks, dict(ranked)
 
-            response = requests.get(target_url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                data_json = response.json()
-                stream_list = data_json.get('data', {}).get('stream', [])
-                next_cursor = data_json.get('data', {}).get('pagination', {}).get('next_cursor')
-
-                if not stream_list: break 
-
-                for msg in stream_list:
-                    try:
-                        created_at = msg.get('created_at')
-                        if not created_at: continue
-                        msg_date = parser.parse(created_at).replace(tzinfo=None)
-                        
-                        if msg_date < cutoff_date:
-                            is_finished = True
-                            break 
-                        
-                        content = msg.get('content_original', msg.get('content', ''))
-                        
-                        if content and stock_classifier:
-                            try:
-                                ai_res = stock_classifier(content[:512])[0]
-                                score = ai_res['score']
-                                raw_label = ai_res['label']
-
-                                if score < 0.75:
-                                    label = "NEUTRAL 😐"
-                                elif raw_label == 'LABEL_1':
-                                    label = "BULLISH 🚀"
-                                else:
-                                    label = "BEARISH 🔻"
-                                
-                                all_messages.append(label)
-                            except: pass
-                    except: continue
-                
-                if next_cursor:
-                    current_cursor = next_cursor
-                else:
-                    break
-            else:
-                break
-            time.sleep(0.05) 
+@st.cache_resource
+def get_lead_lag_engine():
+    # Shared by every session; recomputed for all tickers at most every REFRESH_SECONDS.
+    return lead_lag.LeadLagEngine(store=load_stream_store())
 
-    except Exception:
-        pass
-    
-    my_bar.empty()
+FETCH_WORKERS = int(os.getenv("DASHBOARD_FETCH_WORKERS", "8"))
 
-    if all_messages:
-        total = len(all_messages)
-        bullish = all_messages.count("BULLISH 🚀")
-        bearish = all_messages.count("BEARISH 🔻")
-        neutral = all_messages.count("NEUTRAL 😐")
-        
-        stats = {"BULLISH": bullish, "BEARISH": bearish, "NEUTRAL": neutral}
-        dominant_key = max(stats, key=stats.get)
-        
-        dominant_label = dominant_key
-        if "BULLISH" in dominant_key: dominant_label += " 🚀"
-        elif "BEARISH" in dominant_key: dominant_label += " 🔻"
-        else: dominant_label += " 😐"
-        
-        return {
-            "total": total,
-            "stats": stats,
-            "dominant": dominant_label,
-            "bullish_pct": (bullish/total)*100
-        }
-    
-    return None
+@st.cache_resource
+def get_fetch_pool():
+    # Shared by every session; sentiment fetches for the main ticker and the
+    # candidates run here side by side instead of one after another.
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="sentiment-fetch")
+
+def submit_sentiment(ticker, days, user_token, model_ready, count_clusters_once):
+    """
+    Starts get_stock_sentiment on the fetch pool and returns the future.
+    The st.cache_resource getters run here, on the script thread, and their
+    results are handed to the worker: pool threads are shared by every
+    session and never get a script context.
+    """
+    return get_fetch_pool().submit(
+        get_stock_sentiment, ticker, days, user_token, get_data_layer(), load_stream_store(),
+        load_sentiment_cache(), model_ready=model_ready, count_clusters_once=count_clusters_once
+    )
+
+LIVE_POLL_SECONDS = int(os.getenv("DASHBOARD_LIVE_POLL_SECONDS", "15"))
+LIVE_WINDOW_MINUTES = 60
+LIVE_SPARKLINE_POINTS = 120
+
+def poll_live(ticker, user_token, newest_stream_id, newest_date):
+    """
+    Messages newer than `newest_stream_id`, from one request for the head
+    of the stream, labeled and saved to the store. Sessions following the
+    same ticker from the same message share the request through the data
+    layer. Returns {"rows", "joined"} or None (no token/URL, or rejected).
+    """
+    base_url = os.getenv("TARGET_STREAM_URL")
+    if not user_token or not base_url:
+        return None
+    target_url = f"{base_url}/{ticker}"
+
+    def load(token):
+        try:
+            rows, outcome = stream_scraper.poll_head(target_url, auth_headers(token), newest_stream_id, newest_date)
+        except Exception:
+            rows, outcome = [], {"reason": "error", "status_code": None}
+        if outcome["status_code"] in data_layer.DENIED_STATUS:
+            return None, False
+
+        store = load_stream_store()
+        stock_classifier = model_warmup.classifier if model_warmup.is_ready() else None
+        if rows and stock_classifier:
+            sentiment_engine.label_rows(stock_classifier, rows, cache=load_sentiment_cache())
+        store.save_messages(ticker, rows)
+
+        joined = outcome["reason"] in ("known", "cutoff")
+        state = store.get_state(ticker)
+        # Only move the stored range's head if these rows extend it directly.
+        if rows and joined and state and str(state["newest_stream_id"]) == str(newest_stream_id):
+            store.set_state(ticker, {**state, "newest_stream_id": str(rows[0]['stream_id']),
+                                     "newest_date": rows[0]['date']})
+        return {"rows": rows, "joined": joined}, data_layer.authorization_from_status([outcome["status_code"]])
+
+    key = ("live", ticker, str(newest_stream_id))
+    return get_data_layer().get(key, user_token, load, LIVE_POLL_SECONDS)
+
+def start_live(ticker):
+    """
+    Session state for following `ticker`, seeded from the store: the newest
+    stored message as the cursor and the last LIVE_WINDOW_MINUTES of labeled
+    messages as the rolling tally. None if the ticker was never fetched.
+    """
+    store = load_stream_store()
+    state = store.get_state(ticker)
+    if not state:
+        return None
+    since = datetime.now() - timedelta(minutes=LIVE_WINDOW_MINUTES)
+    recent = [row for row in store.load_messages(ticker, since=since) if row['content']]
+    return {
+        "ticker": ticker,
+        "newest_stream_id": str(state["newest_stream_id"]),
+        "newest_date": state["newest_date"],
+        "messages": deque((row['date'], row['ai_sentiment']) for row in reversed(recent)),
+        "series": deque(maxlen=LIVE_SPARKLINE_POINTS),
+        "new_messages": 0,
+        "gaps": 0
+    }
+
+def live_tally(live):
+    """
+    Drops messages older than the rolling window and counts the rest.
+    """
+    cutoff = (datetime.now() - timedelta(minutes=LIVE_WINDOW_MINUTES)).strftime(stream_scraper.DATE_FORMAT)
+    messages = live["messages"]
+    while messages and messages[0][0] < cutoff:
+        messages.popleft()
+    labels = [sentiment for _, sentiment in messages]
+    return (labels.count(sentiment_engine.BULLISH), labels.count(sentiment_engine.BEARISH),
+            labels.count(sentiment_engine.NEUTRAL))
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def live_tail(ticker, user_token):
+    live = st.session_state.get("live")
+    if not live or live["ticker"] != ticker:
+        live = st.session_state.live = start_live(ticker)
+    if live is None:
+        st.info("Live mode starts once this ticker's stream has been fetched.")
+        return
+
+    update = poll_live(ticker, user_token, live["newest_stream_id"], live["newest_date"])
+    if update is None:
+        st.warning("Live update failed (token rejected or upstream unavailable).")
+    elif update["rows"]:
+        rows = update["rows"]
+        live["newest_stream_id"], live["newest_date"] = str(rows[0]['stream_id']), rows[0]['date']
+        live["messages"].extend((row['date'], row['ai_sentiment']) for row in reversed(rows) if row['content'])
+        live["new_messages"] += len(rows)
+        if not update["joined"]:
+            live["gaps"] += 1
+
+    bullish, bearish, neutral = live_tally(live)
+    total = bullish + bearish + neutral
+    live["series"].append((datetime.now(), bullish / total * 100 if total else None))
+
+    l_col1, l_col2, l_col3, l_col4 = st.columns(4)
+    l_col1.metric(f"🔴 Last {LIVE_WINDOW_MINUTES} min", total, delta=f"+{live['new_messages']} live")
+    l_col2.metric("Bullish", bullish)
+    l_col3.metric("Bearish", bearish)
+    l_col4.metric("Neutral", neutral)
+
+    import plotly.graph_objects as go
+
+    times, values = zip(*live["series"])
+    fig = go.Figure(data=go.Scatter(x=list(times), y=list(values), mode="lines", line=dict(width=2),
+                                    connectgaps=True))
+    fig.update_layout(height=140, margin=dict(l=0, r=0, t=24, b=0), yaxis=dict(range=[0, 100]),
+                      title=dict(text="Bullish % (rolling)", font=dict(size=12)))
+    st.plotly_chart(fig, use_container_width=True)
+
+    note = f"Polling the newest page every {LIVE_POLL_SECONDS}s; last message {live['newest_date']}."
+    if live["gaps"]:
+        note += " More arrived than one page holds between some polls; those extra messages are skipped here."
+    st.caption(note)
 
 st.markdown("<h1 style='text-align: left; pointer-events: none;'>Market Analysis Dashboard</h1>", unsafe_allow_html=True)
 st.markdown("Monitor your portfolio, analyze market sentiment using finetuned ML, and discover diversification opportunities.")
 
+@st.fragment(run_every=2)
+def model_warming_status():
+    if model_warmup.is_ready():
+        st.rerun()
+    st.caption("🧠 Model warming up... sentiment will appear once it is loaded.")
+
+with st.sidebar:
+    if not model_warmup.is_ready():
+        model_warming_status()
+    elif model_warmup.error is not None:
+        st.error(f"Error loading model: {model_warmup.error}")
+
+model_ready = model_warmup.is_ready() and model_warmup.classifier is not None
+
 st.sidebar.header("🔑 Authentication")
 user_raw_token = st.sidebar.text_input("Enter Auth Token", type="password").strip()
 
@@ -247,6 +463,14 @@ ticker_input = st.sidebar.text_input(
 
 timeframe_option = st.sidebar.selectbox("Sentiment Timeframe", ["1 Day", "3 Days"])
 days_back = 1 if timeframe_option == "1 Day" else 3
+count_clusters_once = st.sidebar.checkbox(
+    "Count spam clusters once",
+    help="Near-identical messages (copy-paste spam, cross-posts) count as one message in the sentiment stats."
+)
+live_mode = st.sidebar.toggle(
+    "🔴 Live mode",
+    help=f"Follow the active ticker: new messages every {LIVE_POLL_SECONDS}s, one small request per poll."
+)
 
 if st.sidebar.button("🔍 Analyze Stock"):
     on_ticker_input_change()
@@ -272,6 +496,21 @@ current_ticker = st.session_state.active_ticker.strip().upper()
 
 if current_ticker:
     user_sector = stock_data.get_ticker_sector(current_ticker)
+
+    # Candidates stay fixed per ticker for the session, so reruns reuse the
+    # fetches already started for them.
+    if 'candidates' not in st.session_state: st.session_state.candidates = {}
+    candidates, cand_correlations = [], {}
+    if user_sector != "Unknown":
+        if current_ticker not in st.session_state.candidates:
+            st.session_state.candidates[current_ticker] = pick_candidates(current_ticker, user_sector)
+        candidates, cand_correlations = st.session_state.candidates[current_ticker]
+
+    # Start every sentiment fetch now; they run while the price chart loads and renders.
+    sentiment_futures = {
+        ticker: submit_sentiment(ticker, days_back, user_raw_token, model_ready, count_clusters_once)
+        for ticker in [current_ticker] + candidates
+    }
     
     col1, col2, col3 = st.columns([2, 3, 2])
     col1.metric("Ticker", current_ticker)
@@ -301,12 +540,15 @@ if current_ticker:
     
     with st.spinner(f"Loading data for {current_ticker}..."):
         df_price = get_stock_price(current_ticker, days=180, user_token=user_raw_token) 
-        sentiment_data = get_stock_sentiment(current_ticker, days=days_back, user_token=user_raw_token)
+    with st.spinner(f"Analyzing sentiment for last {days_back} days..."):
+        sentiment_data = sentiment_futures[current_ticker].result()
 
     if df_price.empty and sentiment_data is None:
         st.error("❌ **Data Fetch Failed.** Check your Token or Ticker Symbol.")
     else:
         if not df_price.empty:
+            import plotly.graph_objects as go
+
             fig = go.Figure(data=[go.Candlestick(x=df_price['date'],
                             open=df_price['open'], high=df_price['high'],
                             low=df_price['low'], close=df_price['close'])])
@@ -315,7 +557,9 @@ if current_ticker:
         else:
             st.warning("Price data not found.")
 
-        if sentiment_data:
+        if not model_warmup.is_ready():
+            st.info("🧠 Model warming up... sentiment will appear once it is loaded.")
+        elif sentiment_data:
             s_col1, s_col2, s_col3 = st.columns(3)
             s_col1.info(f"Dominant Sentiment: **{sentiment_data['dominant']}**")
             s_col2.progress(sentiment_data['bullish_pct'] / 100, text=f"Bullish Score: {sentiment_data['bullish_pct']:.1f}%")
@@ -323,31 +567,28 @@ if current_ticker:
         else:
             st.warning("Sentiment data not found.")
 
+        if live_mode:
+            live_tail(current_ticker, user_raw_token)
+
         st.divider()
 
         st.subheader("💡 Diversification Recommendations")
         if user_sector != "Unknown":
-            candidates = stock_data.get_diversification_candidates(user_sector, [current_ticker])
             st.write(f"Since your portfolio contains **{user_sector}**, AI suggests looking at these sectors:")
             
             cand_cols = st.columns(len(candidates))
+            cand_slots = {}
             for idx, cand in enumerate(candidates):
                 with cand_cols[idx]:
                     st.markdown(f"### {cand}")
                     cand_sector = stock_data.get_ticker_sector(cand)
-                    st.caption(f"{cand_sector}")
-                    
-                    with st.spinner("Analyzing..."):
-                        cand_sent = get_stock_sentiment(cand, days=days_back, user_token=user_raw_token)
-                    
-                    if cand_sent:
-                        pct = cand_sent['bullish_pct']
-                        dom = cand_sent['dominant']
-                        if "BULLISH" in dom: st.success(f"{dom} ({pct:.0f}%)")
-                        elif "BEARISH" in dom: st.error(f"{dom} ({pct:.0f}%)")
-                        else: st.warning(f"{dom} ({pct:.0f}%)")
+                    if cand in cand_correlations:
+                        st.caption(f"{cand_sector} · ρ {cand_correlations[cand]:+.2f} vs your watchlist")
                     else:
-                        st.info("No Data")
+                        st.caption(f"{cand_sector}")
+                    
+                    cand_slots[cand] = st.empty()
+                    cand_slots[cand].caption("⏳ Analyzing...")
                     
                     st.button(
                         f"Open Chart {cand}", 
@@ -355,8 +596,91 @@ if current_ticker:
                         on_click=set_ticker_callback, 
                         args=(cand,)
                     )
+
+            # Fill each column as soon as its fetch finishes.
+            cand_futures = {sentiment_futures[cand]: cand for cand in candidates}
+            for future in as_completed(cand_futures):
+                slot = cand_slots[cand_futures[future]]
+                cand_sent = future.result()
+                if not model_warmup.is_ready():
+                    slot.info("🧠 Model warming up")
+                elif cand_sent:
+                    pct = cand_sent['bullish_pct']
+                    dom = cand_sent['dominant']
+                    if "BULLISH" in dom: slot.success(f"{dom} ({pct:.0f}%)")
+                    elif "BEARISH" in dom: slot.error(f"{dom} ({pct:.0f}%)")
+                    else: slot.warning(f"{dom} ({pct:.0f}%)")
+                else:
+                    slot.info("No Data")
         else:
             st.info("Diversification recommendations are available for known stocks only.")
 
+    st.divider()
+
+    heatmap_tickers = list(dict.fromkeys([current_ticker] + st.session_state.watchlist))
+    with st.expander("🗺️ Watchlist Sentiment Heatmap"):
+        # Reads the shared store directly, so only for tokens upstream has accepted.
+        if not get_data_layer().is_trusted(user_raw_token):
+            st.info("Available once your token has been verified.")
+        else:
+            heatmap_days = st.selectbox("Heatmap Range", [1, 3, 7, 30], index=2,
+                                        format_func=lambda d: f"{d} Day{'s' if d > 1 else ''}")
+            period = "hour" if heatmap_days <= 3 else "day"
+            series = load_stream_store().bucket_series(
+                heatmap_tickers, since=datetime.now() - timedelta(days=heatmap_days), period=period
+            )
+            if not series:
+                st.info("No stored messages for these tickers yet.")
+            else:
+                import plotly.graph_objects as go
+
+                df_heat = pd.DataFrame(series)
+                labeled = df_heat[['bullish', 'bearish', 'neutral']].sum(axis=1)
+                df_heat['bullish_pct'] = df_heat['bullish'] / labeled.where(labeled > 0) * 100
+                grid = df_heat.pivot(index='ticker', columns='period', values='bullish_pct')
+
+                fig = go.Figure(data=go.Heatmap(z=grid.values, x=grid.columns, y=grid.index, colorscale="RdYlGn",
+                                                zmin=0, zmax=100, colorbar=dict(title="Bullish %")))
+                fig.update_layout(title=f"Bullish share per {period}", height=120 + 40 * len(grid.index))
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption("Built from stored history; tickers fill in as they are analyzed or scanned.")
+
+    with st.expander(f"⏱️ Sentiment Lead/Lag: {current_ticker}"):
+        if not get_data_layer().is_trusted(user_raw_token):
+            st.info("Available once your token has been verified.")
+        else:
+            engine = get_lead_lag_engine()
+            try:
+                engine.refresh_if_stale()
+                table = engine.ticker_table(current_ticker)
+            except Exception as e:
+                logger.warning("Lead/lag analytics unavailable: %s", e)
+                table = pd.DataFrame()
+
+            if table.empty or table['correlation'].isna().all():
+                st.info(f"Needs at least {engine.min_obs} sessions with both stored messages and price bars "
+                        f"(scan with `scan_watchlist.py --price-days`).")
+            else:
+                import plotly.graph_objects as go
+
+                grid = table.pivot(index='feature', columns='lag', values='correlation').reindex(lead_lag.FEATURES)
+                fig = go.Figure(data=go.Heatmap(z=grid.values, x=grid.columns, y=grid.index, colorscale="RdBu",
+                                                zmin=-1, zmax=1, colorbar=dict(title="ρ")))
+                fig.update_layout(title="Correlation of daily sentiment with the return `lag` sessions later",
+                                  xaxis_title="lag (sessions)", height=320)
+                st.plotly_chart(fig, use_container_width=True)
+
+                hits = table[table['feature'].isin(list(lead_lag.HIT_CENTRES))]
+                hit_grid = hits.pivot(index='feature', columns='lag', values='hit_rate') * 100
+                universe = engine.universe_table()
+                if not universe.empty:
+                    universe = universe[universe['feature'].isin(list(lead_lag.HIT_CENTRES))]
+                    peers = universe.pivot(index='feature', columns='lag', values='hit_rate') * 100
+                    hit_grid = pd.concat([hit_grid, peers.rename(index=lambda f: f"{f} (all tickers)")])
+                st.write("Direction hit rate (%)")
+                st.dataframe(hit_grid.round(1), use_container_width=True)
+                st.caption(f"{engine.sessions} sessions, {len(engine.tickers)} tickers. Positive lags are "
+                           f"forward returns; sentiment only counts messages posted before each close.")
+
 else:
     st.info("👈 Please enter your Auth Token and a Ticker in the sidebar to start.")
\ No newline at end of file
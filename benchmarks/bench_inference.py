@@ -0,0 +1,145 @@
+"""
+Inference throughput baseline on a synthetic stream corpus, through the
+same label_rows path the dashboard and scrape_stream.py use.
+
+    python -m benchmarks.bench_inference
+    python -m benchmarks.bench_inference --size 20000 --backend onnx --with-cache
+    python -m benchmarks.bench_inference --size 50000 --inference-workers 8 --modes window
+"""
+import os
+import time
+import argparse
+import tempfile
+import sentiment_engine
+import sentiment_cache
+import near_duplicates
+import inference_pool
+import stream_scraper
+from benchmarks.common import latency_summary, peak_rss_mb, write_report
+from benchmarks.synthetic_corpus import generate_rows
+
+
+def fresh_rows(rows):
+    return [dict(row) for row in rows]
+
+
+def run_window(classifier, rows, cache, batch_size):
+    """
+    get_stock_sentiment: the whole window labeled in one call.
+    """
+    memo = sentiment_engine.TextMemo()
+    started = time.perf_counter()
+    sentiment_engine.label_rows(classifier, rows, cache=cache, memo=memo, batch_size=batch_size,
+                                near_dupes=near_duplicates.NearDuplicateIndex())
+    seconds = time.perf_counter() - started
+    return seconds, memo.report(), []
+
+
+def run_pages(classifier, rows, cache, batch_size):
+    """
+    scrape_stream.py: one label_rows call per stream page, one near-duplicate
+    index for the whole run. Returns per-page latencies too.
+    """
+    memo = sentiment_engine.TextMemo()
+    clusters = near_duplicates.NearDuplicateIndex()
+    page_latencies = []
+    started = time.perf_counter()
+    for start in range(0, len(rows), stream_scraper.PAGE_LIMIT):
+        page_started = time.perf_counter()
+        sentiment_engine.label_rows(classifier, rows[start:start + stream_scraper.PAGE_LIMIT], cache=cache,
+                                    memo=memo, batch_size=batch_size, near_dupes=clusters)
+        page_latencies.append(time.perf_counter() - page_started)
+    seconds = time.perf_counter() - started
+    return seconds, memo.report(), page_latencies
+
+
+MODES = {"window": run_window, "pages": run_pages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sentiment inference on a synthetic corpus.")
+    parser.add_argument("--size", type=int, default=5000, help="Messages in the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--spam-rate", type=float, default=0.1)
+    parser.add_argument("--backend", default=sentiment_engine.BACKEND, choices=sentiment_engine.BACKENDS)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--inference-workers", type=int, default=0,
+                        help="Classify through an InferencePool of this many processes (default 0: in-process)")
+    parser.add_argument("--threads-per-worker", type=int)
+    parser.add_argument("--batch-size", type=int, default=sentiment_engine.BATCH_SIZE)
+    parser.add_argument("--latency-samples", type=int, default=200, help="Single-message calls timed (no reuse)")
+    parser.add_argument("--with-cache", action="store_true",
+                        help="Use a fresh on-disk SentimentCache, as the app and scrapers do")
+    parser.add_argument("--output-dir", default="bench_results")
+    args = parser.parse_args()
+
+    rows = generate_rows(args.size, args.seed, args.spam_rate)
+    print(f"Corpus: {len(rows)} synthetic messages (seed {args.seed}, spam {args.spam_rate:.0%})")
+
+    started = time.perf_counter()
+    if args.inference_workers > 0:
+        classifier = inference_pool.InferencePool(args.inference_workers, backend=args.backend,
+                                                  threads=args.threads_per_worker).start()
+    else:
+        classifier = sentiment_engine.load_classifier(backend=args.backend)
+    load_seconds = time.perf_counter() - started
+    print(f"Model load ({args.backend}): {load_seconds:.2f}s")
+
+    # Warm-up so lazy initialisation does not count against the first mode.
+    sentiment_engine.classify_texts(classifier, [row['content'] for row in rows[:args.batch_size]],
+                                    batch_size=args.batch_size)
+
+    report = {
+        "corpus": {"size": len(rows), "seed": args.seed, "spam_rate": args.spam_rate},
+        "backend": args.backend,
+        "inference_workers": args.inference_workers,
+        "batch_size": args.batch_size,
+        "with_cache": args.with_cache,
+        "load_seconds": load_seconds,
+        "peak_rss_mb_after_load": peak_rss_mb(),
+        "modes": {}
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            cache = None
+            if args.with_cache:
+                cache = sentiment_cache.SentimentCache(db_path=os.path.join(tmp, f"{mode}.db"), backend=args.backend)
+            seconds, reuse, page_latencies = MODES[mode](classifier, fresh_rows(rows), cache, args.batch_size)
+            if cache:
+                cache.close()
+
+            report["modes"][mode] = {
+                "seconds": seconds,
+                "messages_per_second": len(rows) / seconds if seconds > 0 else 0.0,
+                "model_messages": reuse["classified"],
+                "inference_saved_rate": reuse["inference_saved_rate"],
+                "page_latency": latency_summary(page_latencies) if page_latencies else None,
+                "peak_rss_mb": peak_rss_mb()
+            }
+            print(f"{mode:<7} {report['modes'][mode]['messages_per_second']:8.1f} msg/s | "
+                  f"{reuse['classified']} reached the model | {seconds:.2f}s")
+
+    latencies = []
+    for row in rows[:args.latency_samples]:
+        started = time.perf_counter()
+        sentiment_engine.classify_messages(classifier, [(None, row['content'])], memo=None, batch_size=1)
+        latencies.append(time.perf_counter() - started)
+    report["single_message_latency"] = latency_summary(latencies)
+    # Main process only; pool workers hold their own model copies.
+    report["peak_rss_mb"] = peak_rss_mb()
+    if isinstance(classifier, inference_pool.InferencePool):
+        classifier.close()
+
+    single = report["single_message_latency"]
+    print(f"single  p50 {single['p50_ms']:.1f} ms | p95 {single['p95_ms']:.1f} ms | p99 {single['p99_ms']:.1f} ms")
+    if report["peak_rss_mb"] is not None:
+        print(f"Peak RSS: {report['peak_rss_mb']:.0f} MB")
+
+    path = write_report(report, args.output_dir, "bench_inference")
+    print(f"\n✅ SAVED: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
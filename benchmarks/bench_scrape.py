@@ -0,0 +1,220 @@
+"""
+End-to-end fetch and pagination benchmark against the local mock upstream.
+Runs the same code paths as the scrapers and the dashboard (stream_sync,
+price_store, the data layer and the sentiment cache), with a stub
+classifier in place of the model. stream_serial and stream_pipelined
+walk the stream with a stub that takes about as long per page as a
+fetch: one labels each page before asking for the next, the other
+labels while the next page is fetched (stream_sync.label_pages).
+
+    python -m benchmarks.bench_scrape
+    python -m benchmarks.bench_scrape --pages 500 --latency-ms 50 --error-rate 0.02 --throttle-rate 0.01
+"""
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+import data_layer
+import http_client
+import near_duplicates
+import price_store
+import sentiment_cache
+import sentiment_engine
+import stream_scraper
+import stream_store
+import stream_sync
+from benchmarks.common import peak_rss_mb, write_report
+from benchmarks.mock_upstream import MockConfig, MockUpstream
+
+HEADERS = {"Authorization": "Bearer bench", "User-Agent": "Mozilla/5.0"}
+
+
+class StubClassifier:
+    """
+    Stands in for the model: labels every text by its length and sleeps
+    `seconds_per_call` per classify call (about one page).
+    """
+
+    def __init__(self, seconds_per_call=0.0):
+        self.seconds_per_call = seconds_per_call
+        self.calls = 0
+
+    def classify_texts(self, texts, batch_size=sentiment_engine.BATCH_SIZE):
+        self.calls += 1
+        if self.seconds_per_call:
+            time.sleep(self.seconds_per_call)
+        labels = [sentiment_engine.BULLISH, sentiment_engine.BEARISH, sentiment_engine.NEUTRAL]
+        return [{"label": "stub", "score": 0.9, "sentiment": labels[len(t) % 3]} for t in texts]
+
+
+def measure(upstream, trace_memory, fn):
+    """
+    Runs fn() and returns its result plus wall time, upstream requests
+    (by status) and, with trace_memory, the peak of Python allocations.
+    """
+    upstream.reset_stats()
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    ok_pages = upstream.stats["status"].get(200, 0)
+    return result, {
+        "seconds": seconds,
+        "requests": upstream.stats["requests"],
+        "status_codes": {str(code): n for code, n in sorted(upstream.stats["status"].items())},
+        "pages_per_second": ok_pages / seconds if seconds > 0 else 0.0,
+        "traced_peak_mb": traced_peak,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against a local mock upstream.")
+    parser.add_argument("--ticker", default="BBCA")
+    parser.add_argument("--pages", type=int, default=200, help="Stream pages served per ticker")
+    parser.add_argument("--price-days", type=int, default=365 * 3, help="Days of price history for the price scraper")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--rps", type=float, default=100, help="Client rate limit (requests/sec)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Track peak Python allocations per scenario (slows everything down)")
+    parser.add_argument("--output-dir", default="bench_results")
+    args = parser.parse_args()
+
+    config = MockConfig(pages=args.pages, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                        error_rate=args.error_rate, throttle_rate=args.throttle_rate, retry_after=0)
+    http_client.configure(rate=args.rps)
+    ticker = args.ticker.upper()
+    report = {"mock": vars(config), "rps": args.rps, "scenarios": {}}
+
+    with MockUpstream(config) as upstream, tempfile.TemporaryDirectory() as tmp:
+        price_url = f"{upstream.price_url}/{ticker}"
+        stream_url = f"{upstream.stream_url}/{ticker}"
+        now = datetime.now()
+        span_minutes = config.pages * config.page_size * config.message_interval_minutes
+        stream_cutoff = upstream.started_at - timedelta(minutes=span_minutes, days=1)
+
+        def price_scrape(db_path):
+            df, _ = price_store.refresh_prices(ticker, price_url, HEADERS, now - timedelta(days=args.price_days), now,
+                                               db_path=db_path)
+            return {"rows": len(df)}
+
+        classifier = StubClassifier()
+        cache = sentiment_cache.SentimentCache(os.path.join(tmp, "sentiment_cache.db"), model_path="bench-stub")
+        stream_db = os.path.join(tmp, "stream.db")
+
+        def stream_scrape():
+            # The page loop of scrape_stream.py (resuming from the stored state).
+            store = stream_store.StreamStore(stream_db)
+            result = {}
+            rows = 0
+            pages = stream_sync.label_pages(
+                stream_scraper.iter_ticker(stream_url, HEADERS, stream_cutoff, state=store.get_state(ticker),
+                                           result=result),
+                classifier, cache=cache, near_dupes=near_duplicates.NearDuplicateIndex()
+            )
+            for page_rows, _ in pages:
+                store.save_messages(ticker, page_rows)
+                rows += len(page_rows)
+            if result["state"]:
+                store.set_state(ticker, result["state"])
+            store.close()
+            return {"rows": rows, "reason": result["outcome"]["reason"]}
+
+        def dashboard_fetch():
+            # What one ticker costs the dashboard on a cold store: get_stock_price
+            # (180 days) then get_stock_sentiment (3 days, up to 20 pages), both
+            # through the shared data layer.
+            layer = data_layer.SharedDataLayer()
+            store = stream_store.StreamStore(os.path.join(tmp, "dashboard_stream.db"))
+
+            def load_price(token):
+                df, codes = price_store.refresh_prices(ticker, price_url, HEADERS, now - timedelta(days=180), now,
+                                                       db_path=os.path.join(tmp, "dashboard_price.db"))
+                return df, data_layer.authorization_from_status(codes)
+
+            def sync_sentiment(token):
+                cutoff = datetime.now() - timedelta(days=3)
+                outcome = stream_sync.sync_ticker(store, ticker, stream_url, HEADERS, cutoff,
+                                                  classifier=classifier, cache=cache)
+                return outcome, data_layer.authorization_from_status([outcome["status_code"]])
+
+            def aggregate(token):
+                cutoff = datetime.now() - timedelta(days=3)
+                stream_sync.label_window(store, ticker, cutoff, classifier, cache=cache)
+                return stream_sync.window_counts(store, ticker, cutoff), layer.is_trusted(token) or None
+
+            df = layer.get(("price", ticker, 180), "bench", load_price, 3600)
+            layer.get(("sentiment_sync", ticker, 3), "bench", sync_sentiment, 900)
+            counts = layer.get(("sentiment", ticker, 3), "bench", aggregate, 900)
+            store.close()
+            return {"price_rows": len(df) if df is not None else 0, "stream_rows": sum(counts or ())}
+
+        def stream_overlap(pipelined, seconds_per_page):
+            # A cold full walk; fresh memo and no disk cache, so every page costs inference.
+            stub = StubClassifier(seconds_per_call=seconds_per_page)
+            memo = sentiment_engine.TextMemo()
+            store = stream_store.StreamStore(os.path.join(tmp, f"stream_pipelined_{pipelined}.db"))
+            result = {}
+            pages = stream_scraper.iter_ticker(stream_url, HEADERS, stream_cutoff, result=result)
+            if pipelined:
+                pages = stream_sync.label_pages(pages, stub, memo=memo)
+            rows = 0
+            for page_rows, _ in pages:
+                if page_rows and not pipelined:
+                    sentiment_engine.label_rows(stub, page_rows, memo=memo)
+                store.save_messages(ticker, page_rows)
+                rows += len(page_rows)
+            store.close()
+            return {"rows": rows, "classify_calls": stub.calls, "seconds_per_call": seconds_per_page}
+
+        price_db = os.path.join(tmp, "price.db")
+        scenarios = [
+            ("price_full", lambda: price_scrape(price_db)),
+            ("price_incremental", lambda: price_scrape(price_db)),
+            ("stream_full", stream_scrape),
+            ("stream_incremental", stream_scrape),
+            ("dashboard_fetch", dashboard_fetch),
+        ]
+        for name, fn in scenarios:
+            result, metrics = measure(upstream, args.trace_memory, fn)
+            report["scenarios"][name] = {**result, **metrics}
+        cache.close()
+
+        # Inference as slow as the fetches measured in stream_full.
+        full = report["scenarios"]["stream_full"]
+        seconds_per_page = full["seconds"] / max(1, full["requests"])
+        for name, pipelined in (("stream_serial", False), ("stream_pipelined", True)):
+            result, metrics = measure(upstream, args.trace_memory, lambda: stream_overlap(pipelined, seconds_per_page))
+            report["scenarios"][name] = {**result, **metrics}
+        serial, pipelined = report["scenarios"]["stream_serial"], report["scenarios"]["stream_pipelined"]
+        report["pipeline_speedup"] = serial["seconds"] / pipelined["seconds"] if pipelined["seconds"] else None
+
+    print("-" * 30)
+    for name, metrics in report["scenarios"].items():
+        line = (f"{name:<19} {metrics['seconds']:7.2f}s | {metrics['requests']:5d} req | "
+                f"{metrics['pages_per_second']:7.1f} pages/s | {metrics['status_codes']}")
+        if metrics["traced_peak_mb"] is not None:
+            line += f" | peak alloc {metrics['traced_peak_mb']:.1f} MB"
+        print(line)
+    if report.get("pipeline_speedup"):
+        print(f"stream_pipelined is {report['pipeline_speedup']:.2f}x stream_serial "
+              f"({report['scenarios']['stream_serial']['seconds_per_call'] * 1000:.0f} ms stub inference per page)")
+
+    path = write_report(report, args.output_dir, "bench_scrape")
+    print(f"\n✅ SAVED: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+import os
+import json
+import sys
+import platform
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of `values` (pct in 0-100). Returns 0.0 for no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(seconds):
+    """
+    Summarizes per-item latencies (in seconds) as milliseconds.
+    """
+    return {
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+        "max_ms": max(seconds) * 1000 if seconds else 0.0
+    }
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB, or None where the
+    resource module is unavailable (Windows).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def write_report(report, output_dir, name):
+    """
+    Writes a benchmark report as JSON, stamped with time and host details so
+    runs from different machines or commits can be compared.
+    Returns the file path.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    report = {
+        "benchmark": name,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        **report
+    }
+    path = os.path.join(output_dir, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    return path
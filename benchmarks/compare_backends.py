@@ -0,0 +1,120 @@
+"""
+Compares sentiment inference backends against the full-precision baseline.
+
+    python -m benchmarks.compare_backends --csv stream_BBCA_30days_AI_Analytics.csv
+    python -m benchmarks.compare_backends --text-file samples.txt --backends quantized onnx
+"""
+import time
+import argparse
+import pandas as pd
+import sentiment_engine
+from benchmarks.common import latency_summary, write_report
+
+
+def load_corpus(csv_files, text_file, limit):
+    texts = []
+    for path in csv_files or []:
+        df = pd.read_csv(path, usecols=["content"])
+        texts += [t for t in df["content"].dropna().astype(str) if t.strip()]
+    if text_file:
+        with open(text_file, "r", encoding="utf-8") as f:
+            texts += [line.strip() for line in f if line.strip()]
+    return texts[:limit] if limit else texts
+
+
+def run_backend(backend, texts, latency_samples, batch_size):
+    """
+    Loads one backend and measures load time, batched throughput and
+    single-message latency. Returns (metrics, results).
+    """
+    started = time.perf_counter()
+    classifier = sentiment_engine.load_classifier(backend=backend)
+    load_seconds = time.perf_counter() - started
+
+    # Warm-up pass so lazy initialisation does not count against throughput.
+    sentiment_engine.classify_texts(classifier, texts[:batch_size], batch_size=batch_size)
+
+    started = time.perf_counter()
+    results = sentiment_engine.classify_texts(classifier, texts, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - started
+
+    latencies = []
+    for text in texts[:latency_samples]:
+        started = time.perf_counter()
+        sentiment_engine.classify_texts(classifier, [text], batch_size=1)
+        latencies.append(time.perf_counter() - started)
+
+    metrics = {
+        "load_seconds": load_seconds,
+        "messages": len(texts),
+        "messages_per_second": len(texts) / batch_seconds if batch_seconds > 0 else 0.0,
+        "single_message_latency": latency_summary(latencies)
+    }
+    return metrics, results
+
+
+def agreement(baseline, candidate):
+    pairs = [(b, c) for b, c in zip(baseline, candidate) if b and c]
+    if not pairs:
+        return {"compared": 0}
+    return {
+        "compared": len(pairs),
+        "raw_label_agreement": sum(b['label'] == c['label'] for b, c in pairs) / len(pairs),
+        "sentiment_agreement": sum(b['sentiment'] == c['sentiment'] for b, c in pairs) / len(pairs),
+        "mean_abs_score_diff": sum(abs(b['score'] - c['score']) for b, c in pairs) / len(pairs),
+        "max_abs_score_diff": max(abs(b['score'] - c['score']) for b, c in pairs)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sentiment backends against the pytorch baseline.")
+    parser.add_argument("--csv", nargs="*", help="Stream CSVs with a 'content' column")
+    parser.add_argument("--text-file", help="Text file with one message per line")
+    parser.add_argument("--backends", nargs="+", default=["quantized", "onnx"],
+                        choices=[b for b in sentiment_engine.BACKENDS if b != "pytorch"])
+    parser.add_argument("--limit", type=int, default=2000, help="Max messages to use (0 = all)")
+    parser.add_argument("--latency-samples", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=sentiment_engine.BATCH_SIZE)
+    parser.add_argument("--output-dir", default="bench_results")
+    args = parser.parse_args()
+
+    texts = load_corpus(args.csv, args.text_file, args.limit)
+    if not texts:
+        print("ERROR: Empty corpus. Pass --csv and/or --text-file.")
+        return 1
+    print(f"Corpus: {len(texts)} messages")
+
+    baseline_metrics, baseline = run_backend("pytorch", texts, args.latency_samples, args.batch_size)
+    report = {"corpus_size": len(texts), "batch_size": args.batch_size, "backends": {"pytorch": baseline_metrics}}
+
+    for backend in args.backends:
+        try:
+            metrics, results = run_backend(backend, texts, args.latency_samples, args.batch_size)
+        except Exception as e:
+            print(f"[SKIP] {backend}: {e}")
+            report["backends"][backend] = {"error": str(e)}
+            continue
+        metrics["agreement_vs_pytorch"] = agreement(baseline, results)
+        metrics["speedup_vs_pytorch"] = metrics["messages_per_second"] / baseline_metrics["messages_per_second"]
+        report["backends"][backend] = metrics
+
+    print("-" * 30)
+    for backend, metrics in report["backends"].items():
+        if "error" in metrics:
+            continue
+        line = (f"{backend:<10} {metrics['messages_per_second']:8.1f} msg/s | "
+                f"p50 {metrics['single_message_latency']['p50_ms']:.1f} ms | "
+                f"p95 {metrics['single_message_latency']['p95_ms']:.1f} ms | load {metrics['load_seconds']:.1f}s")
+        if "agreement_vs_pytorch" in metrics:
+            agree = metrics["agreement_vs_pytorch"]
+            line += (f" | x{metrics['speedup_vs_pytorch']:.2f} | "
+                     f"agree {agree.get('sentiment_agreement', 0) * 100:.1f}%")
+        print(line)
+
+    path = write_report(report, args.output_dir, "compare_backends")
+    print(f"\n✅ SAVED: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,264 @@
+"""
+Local stand-in for the stream and price endpoints, returning the same JSON
+shapes, so scrapers can be load-tested and profiled offline.
+
+    python -m benchmarks.mock_upstream --port 8765 --pages 200 --latency-ms 80 --error-rate 0.02
+
+then point the app or scrapers at it:
+
+    TARGET_STREAM_URL=http://127.0.0.1:8765/stream
+    TARGET_PRICE_URL=http://127.0.0.1:8765/price
+"""
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from benchmarks.synthetic_corpus import generate_texts, USERNAMES
+
+HEAD_STREAM_ID = 1_000_000_000
+# Stream ids are unique across tickers: each ticker counts down from its own head.
+STREAM_ID_SPAN = 10_000_000
+
+
+class MockConfig:
+    """
+    Knobs for the mock server. Every ticker has `pages` pages of
+    `page_size` messages, `message_interval_minutes` apart going back from
+    server start. `error_rate` and `throttle_rate` are the chances a request
+    gets a 503 or a 429 (with Retry-After: `retry_after` seconds).
+    `auth_token`, when set, must appear in the Authorization header (else 401).
+    """
+
+    def __init__(self, pages=50, page_size=20, message_interval_minutes=5, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1, auth_token=None, seed=42):
+        self.pages = pages
+        self.page_size = page_size
+        self.message_interval_minutes = message_interval_minutes
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.auth_token = auth_token
+        self.seed = seed
+
+
+class MockUpstream:
+    """
+    Threaded HTTP server serving /stream/<TICKER> and /price/<TICKER>.
+    Use as a context manager, or start()/stop(). `stats` counts requests
+    per route and responses per status code.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockConfig()
+        self.started_at = datetime.now().replace(microsecond=0)
+        self.stats = {"requests": 0, "stream": 0, "price": 0, "status": {}}
+        self._texts = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stream_url(self):
+        return f"{self.base_url}/stream"
+
+    @property
+    def price_url(self):
+        return f"{self.base_url}/price"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "stream": 0, "price": 0, "status": {}}
+
+    def _count(self, route, status):
+        with self._lock:
+            self.stats["requests"] += 1
+            if route in ("stream", "price"):
+                self.stats[route] += 1
+            self.stats["status"][status] = self.stats["status"].get(status, 0) + 1
+
+    def _ticker_seed(self, ticker):
+        return self.config.seed + zlib.crc32(ticker.encode())
+
+    def _ticker_texts(self, ticker):
+        with self._lock:
+            if ticker not in self._texts:
+                size = self.config.pages * self.config.page_size
+                self._texts[ticker] = generate_texts(size, seed=self._ticker_seed(ticker))
+            return self._texts[ticker]
+
+    def _head_id(self, ticker):
+        return HEAD_STREAM_ID + zlib.crc32(ticker.encode()) * STREAM_ID_SPAN
+
+    def stream_page(self, ticker, last_stream_id=None):
+        """
+        Newest-first page after `last_stream_id`, in the upstream JSON shape.
+        """
+        config = self.config
+        texts = self._ticker_texts(ticker)
+        head = self._head_id(ticker)
+        first = 0 if not last_stream_id else head - int(last_stream_id) + 1
+        last = min(first + config.page_size, len(texts))
+
+        messages = []
+        for i in range(first, last):
+            rng = random.Random(self._ticker_seed(ticker) + i)
+            created = self.started_at - timedelta(minutes=i * config.message_interval_minutes)
+            last_price = rng.randint(50, 10000)
+            messages.append({
+                "stream_id": head - i,
+                "created_at": created.strftime("%Y-%m-%dT%H:%M:%S+07:00"),
+                "content_original": texts[i],
+                "user": {"username": f"{rng.choice(USERNAMES)}{rng.randint(1, 999)}"},
+                "news_feed": {"label": rng.choice(["bullish", "bearish", "neutral"])},
+                "target_price": (
+                    [{"last_price": last_price, "target_price": last_price + rng.randint(-500, 500)}]
+                    if rng.random() < 0.1 else []
+                ),
+                "total_likes": rng.randint(0, 30),
+                "total_replies": rng.randint(0, 8)
+            })
+
+        next_cursor = str(head - (last - 1)) if messages and last < len(texts) else None
+        return {"data": {"stream": messages, "pagination": {"next_cursor": next_cursor}}}
+
+    def price_bars(self, ticker, start_date, end_date):
+        """
+        Daily bars (weekdays) in [start_date, end_date], a seeded random walk per ticker.
+        """
+        epoch = datetime(2000, 1, 3)
+        bars = []
+        day = start_date
+        while day <= end_date:
+            if day.weekday() < 5:
+                rng = random.Random(self._ticker_seed(ticker) + (day - epoch).days)
+                base = 1000 + 500 * ((day - epoch).days % 97) / 97
+                close = round(base * (1 + rng.uniform(-0.03, 0.03)))
+                bars.append({
+                    "date": day.strftime("%Y-%m-%d"),
+                    "open": round(close * (1 + rng.uniform(-0.01, 0.01))),
+                    "high": round(close * (1 + rng.uniform(0, 0.02))),
+                    "low": round(close * (1 - rng.uniform(0, 0.02))),
+                    "close": close,
+                    "volume": rng.randint(100_000, 50_000_000)
+                })
+            day += timedelta(days=1)
+        return {"data": {"result": bars}}
+
+    def _handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, route, status, body=None, extra_headers=None):
+                upstream._count(route, status)
+                payload = json.dumps(body if body is not None else {"error": status}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (extra_headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                config = upstream.config
+                url = urlparse(self.path)
+                parts = [p for p in url.path.split("/") if p]
+                route = parts[0] if parts else ""
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+                if config.latency_ms or config.jitter_ms:
+                    time.sleep((config.latency_ms + upstream._rng.uniform(0, config.jitter_ms)) / 1000)
+
+                if len(parts) != 2 or route not in ("stream", "price"):
+                    return self._send(route, 404)
+                if config.auth_token and config.auth_token not in (self.headers.get("Authorization") or ""):
+                    return self._send(route, 401)
+
+                roll = upstream._rng.random()
+                if roll < config.throttle_rate:
+                    return self._send(route, 429, extra_headers={"Retry-After": str(config.retry_after)})
+                if roll < config.throttle_rate + config.error_rate:
+                    return self._send(route, 503)
+
+                ticker = parts[1].upper()
+                try:
+                    if route == "stream":
+                        body = upstream.stream_page(ticker, params.get("last_stream_id"))
+                    else:
+                        body = upstream.price_bars(
+                            ticker,
+                            datetime.strptime(params["start_date"], "%Y-%m-%d"),
+                            datetime.strptime(params["end_date"], "%Y-%m-%d")
+                        )
+                except (KeyError, ValueError):
+                    return self._send(route, 400)
+                self._send(route, 200, body)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve mock stream and price endpoints locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=50, help="Stream pages per ticker")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--interval-minutes", type=float, default=5, help="Minutes between messages")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered 429")
+    parser.add_argument("--auth-token", help="Reject requests without this token (401)")
+    args = parser.parse_args()
+
+    config = MockConfig(pages=args.pages, page_size=args.page_size, message_interval_minutes=args.interval_minutes,
+                        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate, auth_token=args.auth_token)
+    upstream = MockUpstream(config, host=args.host, port=args.port)
+    print(f"Mock upstream on {upstream.base_url}")
+    print(f"  TARGET_STREAM_URL={upstream.stream_url}")
+    print(f"  TARGET_PRICE_URL={upstream.price_url}")
+    try:
+        upstream._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        upstream._server.server_close()
+        print(f"\nServed {upstream.stats['requests']} requests: {upstream.stats['status']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,136 @@
+"""
+Reproducible synthetic stream corpus: Indonesian stock-chat messages with
+ticker mentions, emojis, prices and copy-paste spam, shaped like the rows
+stream_parser.parse_page produces.
+
+    python -m benchmarks.synthetic_corpus --size 5000 --out corpus.txt
+"""
+import random
+import argparse
+from datetime import datetime, timedelta
+import stock_data
+
+OPENERS = [
+    "{t} hari ini", "pantau {t}", "{t} gimana nih", "info {t}", "menurut gw {t}", "hold {t}",
+    "baru masuk {t}", "{t} mantap", "yang pegang {t}", "analisa {t}", "cek {t}", "{t} {t2} {t3}"
+]
+BULLISH = [
+    "naik terus", "breakout resistance", "akumulasi bandar mulai kelihatan", "siap terbang",
+    "volume masuk gede", "laporan keuangan bagus", "dividen menarik", "buy on weakness",
+    "target {p} dalam seminggu", "uptrend masih kuat", "foreign net buy", "to the moon"
+]
+BEARISH = [
+    "jebol support", "distribusi terus", "cut loss dulu", "turun lagi", "foreign net sell",
+    "hati hati guyuran", "downtrend belum selesai", "lepas di {p}", "auto reject bawah",
+    "laba anjlok", "nyangkut di pucuk", "jangan serok dulu"
+]
+NEUTRAL = [
+    "sideways aja", "wait and see", "ada yang tau jadwal rups", "volume sepi", "nunggu konfirmasi",
+    "range {p} sampai {p2}", "gimana pendapat suhu", "masih konsolidasi", "besok libur bursa ya",
+    "antri di {p}", "sabar dulu", "lihat besok"
+]
+FILLERS = [
+    "semoga cuan", "dyor", "bukan ajakan beli atau jual", "cmiiw", "wkwk", "mohon pencerahan",
+    "salam cuan", "jangan fomo", "pakai duit dingin", "pelan pelan aja"
+]
+SPAM = [
+    "{t} pasti naik {p}!! join grup vip sekarang gratis {e}",
+    "sinyal akurat 99% {t} {t2} hari ini, dm untuk info {e}",
+    "{t} auto ARA besok, link di bio {e}"
+]
+EMOJIS = ["🚀", "🔥", "📈", "📉", "💰", "😂", "🙏", "😭", "💎", "🤑", "⚠️", "👀"]
+USERNAMES = ["trader", "cuanhunter", "bandarmologi", "sahamreceh", "investorpemula", "swinger", "suhu"]
+
+
+def _price(rng):
+    return rng.choice([50, 100, 500, 1000, 5000]) * rng.randint(1, 40)
+
+
+def _fill(rng, template, tickers):
+    picks = rng.sample(tickers, 3)
+    price = _price(rng)
+    return template.format(
+        t=rng.choice(["$", ""]) + picks[0], t2="$" + picks[1], t3="$" + picks[2],
+        p=price, p2=price + _price(rng), e=" ".join(rng.choices(EMOJIS, k=rng.randint(1, 3)))
+    )
+
+
+def _message(rng, tickers):
+    """
+    One organic message: an opener plus a geometric number of clauses, so
+    most messages are short and a few are long rants (like the real stream).
+    """
+    mood = rng.choices([BULLISH, BEARISH, NEUTRAL], weights=[45, 25, 30])[0]
+    parts = [_fill(rng, rng.choice(OPENERS), tickers)]
+    while True:
+        parts.append(_fill(rng, rng.choice(mood if rng.random() < 0.8 else FILLERS), tickers))
+        if rng.random() < 0.45:
+            break
+    text = ", ".join(parts)
+    if rng.random() < 0.4:
+        text += " " + "".join(rng.choices(EMOJIS, k=rng.randint(1, 4)))
+    if rng.random() < 0.1:
+        text = f"@{rng.choice(USERNAMES)}{rng.randint(1, 999)} {text}"
+    return text
+
+
+def generate_texts(size, seed=42, spam_rate=0.1):
+    """
+    Returns `size` messages. The same (size, seed, spam_rate) always gives
+    the same corpus. About `spam_rate` of them are variants of a few spam
+    templates (different ticker, price or emoji).
+    """
+    rng = random.Random(seed)
+    tickers = sorted(stock_data.SECTOR_DATABASE.keys())
+    spam_bases = [rng.choice(SPAM) for _ in range(5)]
+    texts = []
+    for _ in range(size):
+        if rng.random() < spam_rate:
+            texts.append(_fill(rng, rng.choice(spam_bases), tickers))
+        else:
+            texts.append(_message(rng, tickers))
+    return texts
+
+
+def generate_rows(size, seed=42, spam_rate=0.1, start=None):
+    """
+    Same corpus as generate_texts, as stream rows (newest first, one
+    message a minute back from `start`) with the AI columns left empty.
+    """
+    rng = random.Random(seed + 1)
+    start = start or datetime(2024, 1, 31, 16, 0, 0)
+    rows = []
+    for i, text in enumerate(generate_texts(size, seed, spam_rate)):
+        rows.append({
+            "stream_id": str(10_000_000 + size - i),
+            "date": (start - timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'),
+            "username": rng.choice(USERNAMES),
+            "content": text,
+            "sentiment_label": rng.choice(["bullish", "bearish", "neutral"]),
+            "prediction_signal": "none",
+            "ai_sentiment": None,
+            "ai_confidence": 0.0,
+            "likes": rng.randint(0, 20),
+            "replies": rng.randint(0, 5)
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic stream corpus, one message per line.")
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--spam-rate", type=float, default=0.1)
+    parser.add_argument("--out", default="synthetic_corpus.txt")
+    args = parser.parse_args()
+
+    texts = generate_texts(args.size, args.seed, args.spam_rate)
+    with open(args.out, "w", encoding="utf-8") as f:
+        for text in texts:
+            f.write(text.replace("\n", " ") + "\n")
+    print(f"✅ SAVED: {args.out} ({len(texts)} messages)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
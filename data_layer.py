@@ -0,0 +1,175 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+MAX_ENTRIES = 1024
+AUTH_TTL_SECONDS = 900
+DENIED_STATUS = {401, 403}
+
+
+def authorization_from_status(status_codes):
+    """
+    Reads upstream status codes as an authorization verdict:
+    False if any was 401/403, True if any succeeded, else None (unknown,
+    e.g. connection errors).
+    """
+    codes = set(status_codes)
+    if codes & DENIED_STATUS:
+        return False
+    if 200 in codes:
+        return True
+    return None
+
+
+def token_id(token):
+    # Tokens are only kept as hashes.
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU of values that expire `ttl` seconds after they are stored.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, the others block until it finishes and get the same result
+    (or exception).
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+
+class Unauthorized(Exception):
+    def __init__(self, token_hash):
+        super().__init__("upstream rejected the token")
+        self.token_hash = token_hash
+
+
+_MISSING = object()
+
+
+class SharedDataLayer:
+    """
+    Server-wide cache for upstream data, shared by every dashboard session.
+
+    Entries are keyed by what was fetched (e.g. ticker and window), never
+    by token; the token only decides whether a caller may see them. A
+    token is trusted once upstream accepted it (by a fetch, or by a cheap
+    `probe` request when the data was already cached) and is re-checked
+    after AUTH_TTL_SECONDS; a probe that cannot reach upstream does not
+    block cached data. Concurrent misses on the same key run a single fetch.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, auth_ttl=AUTH_TTL_SECONDS):
+        self.auth_ttl = auth_ttl
+        self._data = TTLCache(max_entries)
+        self._auth = TTLCache(max_entries)
+        self._flight = SingleFlight()
+
+    def is_trusted(self, token):
+        """
+        True if upstream accepted `token` within the last auth_ttl seconds.
+        """
+        return bool(token) and self._auth.get(token_id(token)) is True
+
+    def _load(self, key, token_hash, token, load, ttl):
+        value, authorized = load(token)
+        if authorized is False:
+            raise Unauthorized(token_hash)
+        if authorized:
+            self._auth.put(token_hash, True, self.auth_ttl)
+            self._data.put(key, value, ttl)
+        return value
+
+    def get(self, key, token, load, ttl, probe=None):
+        """
+        Returns the cached value for `key`, or runs `load(token)` once for
+        every concurrent caller that missed. Returns None if the token is
+        rejected.
+
+        load(token) -> (value, authorized) and probe(token) -> authorized,
+        where authorized is True, False (401/403) or None (unknown); values
+        are only cached when the fetch was authorized.
+        """
+        if not token:
+            return None
+        token_hash = token_id(token)
+        if self._auth.get(token_hash) is False:
+            return None
+
+        value = self._data.get(key, _MISSING)
+        for _ in range(2):
+            if value is not _MISSING:
+                break
+            try:
+                value = self._flight.do(key, lambda: self._load(key, token_hash, token, load, ttl))
+            except Unauthorized as e:
+                if e.token_hash == token_hash:
+                    self._auth.put(token_hash, False, self.auth_ttl)
+                    return None
+                # Another caller's token was rejected; fetch again with ours.
+                value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            return None
+
+        if self._auth.get(token_hash) is None and probe is not None:
+            authorized = probe(token)
+            if authorized is False:
+                self._auth.put(token_hash, False, self.auth_ttl)
+                return None
+            if authorized:
+                self._auth.put(token_hash, True, self.auth_ttl)
+        return value
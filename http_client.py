@@ -0,0 +1,191 @@
+import os
+import time
+import random
+import threading
+import requests
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+import metrics
+
+REQUESTS_PER_SECOND = float(os.getenv("TARGET_REQUESTS_PER_SECOND", "2"))
+# Requests allowed back to back before the rate applies; covers a cold
+# price load (a window per month) fetched by every price worker at once.
+REQUEST_BURST = int(os.getenv("TARGET_REQUEST_BURST", "8"))
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 0.5
+TIMEOUT_SECONDS = 30
+POOL_SIZE = 16
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with an adaptive rate.
+
+    Up to `burst` requests may go out back to back; after that they are
+    spaced at `rate`. The rate is cut in half whenever upstream throttles
+    us and creeps back towards `max_rate` with every successful request (AIMD).
+    """
+
+    def __init__(self, rate, burst=1, min_rate=0.2):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.max_rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            # No burst straight after a 429; tokens refill at the lowered rate.
+            self._tokens = 0
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+def parse_retry_after(value):
+    """
+    Returns the Retry-After header as seconds, or None if missing/unreadable.
+    Accepts both delta-seconds and HTTP-date forms.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HttpClient:
+    """
+    Shared upstream client: one keep-alive connection pool for the whole
+    process, a global adaptive rate limit, and retries with exponential
+    backoff on connection errors, 429 and 5xx responses.
+
+    Each thread gets its own light Session (Session objects are not
+    thread-safe), but all of them share one HTTPAdapter, whose urllib3
+    pool is. Connections therefore outlive the short-lived worker threads
+    that use them, and up to `pool_size` are kept open per host.
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, max_retries=MAX_RETRIES, backoff=BACKOFF_SECONDS,
+                 timeout=TIMEOUT_SECONDS, pool_size=POOL_SIZE, burst=REQUEST_BURST):
+        self.limiter = TokenBucket(rate, burst=max(1, burst))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+        return session
+
+    def _backoff_delay(self, attempt):
+        return self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+    def get(self, url, headers=None, params=None):
+        """
+        GETs `url`, retrying transient failures.
+        Returns the final Response (which may still be a 429/5xx once retries
+        run out). Raises the last connection error if every attempt failed.
+        """
+        for attempt in range(self.max_retries + 1):
+            with metrics.stage("rate_limit_wait"):
+                self.limiter.acquire()
+            try:
+                with metrics.stage("http_request"):
+                    response = self._session().get(url, headers=headers, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                metrics.inc("http_requests_total", status="error")
+                if attempt == self.max_retries:
+                    raise
+                metrics.inc("http_retries_total", reason="connection")
+                with metrics.stage("retry_backoff"):
+                    time.sleep(self._backoff_delay(attempt))
+                continue
+
+            metrics.inc("http_requests_total", status=response.status_code)
+            metrics.inc("http_response_bytes_total", len(response.content))
+            if response.status_code not in RETRY_STATUS:
+                self.limiter.on_success()
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                self.limiter.on_throttle(retry_after)
+            if attempt == self.max_retries:
+                return response
+            metrics.inc("http_retries_total", reason=response.status_code)
+            with metrics.stage("retry_backoff"):
+                time.sleep(retry_after if retry_after is not None else self._backoff_delay(attempt))
+
+        return response
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide client, creating it on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def configure(**kwargs):
+    """
+    Replaces the process-wide client, e.g. configure(rate=4) for a batch job.
+    """
+    global _client
+    with _client_lock:
+        _client = HttpClient(**kwargs)
+        return _client
+
+
+def get(url, headers=None, params=None):
+    return get_client().get(url, headers=headers, params=params)
@@ -0,0 +1,130 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+import sentiment_engine
+
+logger = logging.getLogger(__name__)
+
+# Shards waiting or running per worker before submitters block.
+PENDING_PER_WORKER = 4
+
+_classifier = None
+
+
+def _init_worker(model_path, backend, threads):
+    """
+    Runs once in every worker process: caps the math libraries' thread
+    pools, then loads the model for this process's lifetime.
+    """
+    global _classifier
+    # Must be set before torch / onnxruntime create their thread pools.
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+    _classifier = sentiment_engine.load_classifier(model_path, backend=backend)
+
+
+def _classify_shard(texts, batch_size):
+    return sentiment_engine.classify_texts(_classifier, texts, batch_size=batch_size)
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+class InferencePool:
+    """
+    Classifier stand-in that shards classify_texts() over worker processes,
+    each holding its own copy of the model and `threads` torch threads
+    (default: the CPU count split evenly across workers).
+
+    Texts are ordered by length and cut into shards of `shard_size` (default
+    one batch), so a single large call keeps every worker busy. At most
+    `max_pending` shards are queued or running; callers block beyond that,
+    which throttles whoever feeds the pool. Results come back in input
+    order. Safe to call from several threads.
+
+    Pass it anywhere a classifier is accepted (classify_messages,
+    label_rows); sentiment_engine.classify_texts hands the work over.
+    """
+
+    def __init__(self, workers, model_path=sentiment_engine.MODEL_PATH, backend=sentiment_engine.BACKEND,
+                 threads=None, shard_size=None, max_pending=None):
+        self.workers = max(1, workers)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.shard_size = shard_size
+        self.max_pending = max_pending or self.workers * PENDING_PER_WORKER
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        # spawn: forking a process that already runs threads (fetchers, torch) is unsafe.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, backend, self.threads)
+        )
+
+    def start(self):
+        """
+        Starts every worker and waits until each has loaded the model.
+        Raises (BrokenProcessPool) and shuts the pool down if loading
+        failed. Returns self.
+        """
+        try:
+            pids = {future.result() for future in [self._executor.submit(_worker_pid) for _ in range(self.workers)]}
+        except BaseException:
+            self.close()
+            raise
+        logger.info("Inference pool ready: %d workers x %d threads (%d processes up)",
+                    self.workers, self.threads, len(pids))
+        return self
+
+    def _submit(self, texts, batch_size):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(_classify_shard, texts, batch_size)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def classify_texts(self, texts, batch_size=sentiment_engine.BATCH_SIZE):
+        """
+        Same contract as sentiment_engine.classify_texts: one result (or
+        None) per text, in input order.
+        """
+        results = [None] * len(texts)
+        if not texts:
+            return results
+
+        shard_size = self.shard_size or batch_size
+        # Character length approximates token length well enough to keep
+        # similar texts in one shard; workers sort by tokens within it.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        shards = []
+        for start in range(0, len(order), shard_size):
+            idx = order[start:start + shard_size]
+            shards.append((idx, self._submit([texts[i] for i in idx], batch_size)))
+
+        wait([future for _, future in shards])
+        for idx, future in shards:
+            for i, res in zip(idx, future.result()):
+                results[i] = res
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,221 @@
+import time
+import warnings
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import price_store
+import stream_store
+
+LOOKBACK_DAYS = 180
+MAX_LAG = 5
+MIN_OBS = 10
+REFRESH_SECONDS = 900
+
+# Daily sentiment features. bullish_share and target_net have a direction,
+# so they also get a hit rate: how often sign(feature - centre) matches the
+# sign of the return.
+FEATURES = ["bullish_share", "messages", "bullish_target", "bearish_target", "target_net"]
+HIT_CENTRES = {"bullish_share": 0.5, "target_net": 0.0}
+
+
+def _session_features(series, dates, tickers):
+    """
+    Turns bucket_series(period="session") rows into a
+    (features x dates x tickers) array on the trading calendar `dates`.
+    A session day without a trading date (weekend, holiday) rolls into the
+    next trading date, whose close it precedes; days after the last stored
+    close are dropped. Ticker-days without messages are NaN.
+    """
+    shape = (len(dates), len(tickers))
+    features = np.full((len(FEATURES),) + shape, np.nan)
+    if not series or not len(dates):
+        return features
+
+    frame = pd.DataFrame(series)
+    pos = np.searchsorted(dates.to_numpy(), pd.to_datetime(frame["period"]).to_numpy(), side="left")
+    col = frame["ticker"].map({t: i for i, t in enumerate(tickers)}).to_numpy()
+    keep = (pos < len(dates)) & ~pd.isna(col)
+    pos, col = pos[keep], col[keep].astype(np.int64)
+
+    totals = {}
+    for name in ["messages", "bullish", "bearish", "bullish_target", "bearish_target"]:
+        grid = np.zeros(shape)
+        np.add.at(grid, (pos, col), frame[name].to_numpy(dtype=np.float64)[keep])
+        totals[name] = grid
+
+    seen = totals["messages"] > 0
+    labeled = totals["bullish"] + totals["bearish"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = {
+            "bullish_share": np.where(labeled > 0, totals["bullish"] / labeled, np.nan),
+            "messages": np.where(seen, np.log1p(totals["messages"]), np.nan),
+            "bullish_target": np.where(seen, totals["bullish_target"], np.nan),
+            "bearish_target": np.where(seen, totals["bearish_target"], np.nan),
+            "target_net": np.where(seen, totals["bullish_target"] - totals["bearish_target"], np.nan)
+        }
+    for i, name in enumerate(FEATURES):
+        features[i] = values[name]
+    return features
+
+
+def _lagged_returns(returns, max_lag):
+    """
+    (dates x tickers x lags) view where [t, :, j] is the return of session
+    t + (j - max_lag), NaN past either end. Empty (0 x tickers x lags) when
+    there are no returns.
+    """
+    if not len(returns):
+        return np.empty((0,) + returns.shape[1:] + (2 * max_lag + 1,))
+    pad = np.full((max_lag,) + returns.shape[1:], np.nan)
+    padded = np.concatenate([pad, returns, pad])
+    return np.lib.stride_tricks.sliding_window_view(padded, 2 * max_lag + 1, axis=0)
+
+
+def _lead_lag_stats(feature, lagged, centre, min_obs):
+    """
+    Pairwise-complete correlation, hit rate and overlap count of one
+    (dates x tickers) feature against every lag of `lagged`, for all
+    tickers at once. Each result is (tickers x lags).
+    """
+    x = feature[:, :, None]
+    mask = ~np.isnan(x) & ~np.isnan(lagged)
+    xv = np.where(mask, x, 0.0)
+    yv = np.where(mask, lagged, 0.0)
+
+    n = mask.sum(axis=0)
+    sx, sy = xv.sum(axis=0), yv.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * (xv * yv).sum(axis=0) - sx * sy
+        var_x = n * (xv * xv).sum(axis=0) - sx * sx
+        var_y = n * (yv * yv).sum(axis=0) - sy * sy
+        corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+    corr[n < min_obs] = np.nan
+
+    hit_rate = np.full(corr.shape, np.nan)
+    if centre is not None:
+        direction = np.sign(np.where(mask, x - centre, 0.0)) * np.sign(yv)
+        trials = (direction != 0).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hit_rate = np.where(trials >= min_obs, (direction > 0).sum(axis=0) / trials, np.nan)
+    return corr, hit_rate, n
+
+
+class LeadLagEngine:
+    """
+    Lead/lag between daily sentiment and daily log returns, for every
+    ticker that has both indexed messages and stored bars.
+
+    Sentiment on session t only uses messages posted before t's close
+    (see stream_store.bucket_series, period="session") and is paired with
+    the return of session t + lag, so positive lags are forward returns
+    (lag 1 = close of t to close of t+1), lag 0 the same session and
+    negative lags the sessions before. Everything is computed in one pass
+    of array operations over (dates x tickers x lags) and kept until the
+    next refresh, so any ticker's table is a lookup.
+    """
+
+    def __init__(self, store=None, db_path=price_store.STORE_PATH, lookback=LOOKBACK_DAYS, max_lag=MAX_LAG,
+                 min_obs=MIN_OBS):
+        self.store = store
+        self.db_path = db_path
+        self.lookback = lookback
+        self.max_lag = max_lag
+        self.min_obs = min_obs
+        self.lags = np.arange(-max_lag, max_lag + 1)
+        self.tickers = []
+        self.sessions = 0
+        self.corr = np.empty((len(FEATURES), 0, len(self.lags)))
+        self.hit_rate = self.corr.copy()
+        self.observations = np.zeros(self.corr.shape, dtype=np.int64)
+        self.updated_at = 0.0
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Recomputes every ticker from the stores. Returns the number of
+        tickers covered.
+        """
+        store = self.store or stream_store.StreamStore()
+        try:
+            return self._compute(store)
+        finally:
+            if store is not self.store:
+                store.close()
+
+    def _compute(self, store):
+        since = datetime.now() - timedelta(days=self.lookback)
+        tickers = sorted(set(store.stored_tickers()) & set(price_store.stored_tickers(self.db_path)))
+
+        # One extra week of closes so the first session in range has a return.
+        closes = price_store.load_closes(tickers, db_path=self.db_path, since=since - timedelta(days=7))
+        tickers = list(closes.columns)
+        dates, returns = pd.DatetimeIndex([]), np.empty((0, len(tickers)))
+        if len(closes) > 1:
+            returns = np.diff(np.log(closes.to_numpy(dtype=np.float64)), axis=0)
+            dates = closes.index[1:]
+            in_range = dates >= pd.Timestamp(since)
+            dates, returns = dates[in_range], returns[in_range]
+
+        features = _session_features(store.bucket_series(tickers, since=since, period="session") if tickers else [],
+                                     dates, tickers)
+        lagged = _lagged_returns(returns, self.max_lag)
+
+        shape = (len(FEATURES), len(tickers), len(self.lags))
+        corr, hit_rate = np.full(shape, np.nan), np.full(shape, np.nan)
+        observations = np.zeros(shape, dtype=np.int64)
+        for i, name in enumerate(FEATURES):
+            corr[i], hit_rate[i], observations[i] = _lead_lag_stats(
+                features[i], lagged, HIT_CENTRES.get(name), self.min_obs
+            )
+
+        with self._lock:
+            self.tickers = tickers
+            self._index = {t: i for i, t in enumerate(tickers)}
+            self.sessions = len(dates)
+            self.corr, self.hit_rate, self.observations = corr, hit_rate, observations
+            self.updated_at = time.time()
+        return len(tickers)
+
+    def refresh_if_stale(self, max_age=REFRESH_SECONDS):
+        if time.time() - self.updated_at > max_age:
+            self.refresh()
+
+    def _table(self, corr, hit_rate, observations):
+        frames = []
+        for i, name in enumerate(FEATURES):
+            frames.append(pd.DataFrame({
+                "lag": self.lags,
+                "feature": name,
+                "correlation": corr[i],
+                "hit_rate": hit_rate[i],
+                "observations": observations[i]
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+    def ticker_table(self, ticker):
+        """
+        Long-form DataFrame (lag, feature, correlation, hit_rate,
+        observations) for one ticker, or an empty one if it is not covered.
+        """
+        with self._lock:
+            i = self._index.get(ticker.upper())
+            if i is None:
+                return pd.DataFrame()
+            return self._table(self.corr[:, i], self.hit_rate[:, i], self.observations[:, i])
+
+    def universe_table(self):
+        """
+        Same columns across all covered tickers: the median per-ticker
+        correlation and the mean per-ticker hit rate; observations are summed.
+        """
+        with self._lock:
+            if not self.tickers:
+                return pd.DataFrame()
+            with warnings.catch_warnings():
+                # All-NaN lags (not enough history anywhere) stay NaN.
+                warnings.simplefilter("ignore", RuntimeWarning)
+                corr = np.nanmedian(self.corr, axis=1)
+                hit_rate = np.nanmean(self.hit_rate, axis=1)
+            return self._table(corr, hit_rate, self.observations.sum(axis=1))
@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Where run reports go; set METRICS_DIR= (empty) to turn writing off.
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+# "cprofile" or "pyinstrument" profiles one script run (see start_run).
+PROFILE = os.getenv("PROFILE_RUN", "").strip().lower()
+PROFILERS = ("cprofile", "pyinstrument")
+
+PROM_PREFIX = "idx_"
+
+# HELP lines for the Prometheus file; anything else gets a generic one.
+DESCRIPTIONS = {
+    "http_requests_total": "Upstream HTTP responses by status code (connection errors as status=\"error\").",
+    "http_retries_total": "Upstream requests retried, by reason.",
+    "http_response_bytes_total": "Upstream response body bytes received.",
+    "messages_parsed_total": "Stream messages parsed.",
+    "messages_malformed_total": "Stream messages skipped because they could not be parsed.",
+    "messages_classified_total": "Texts sent through the sentiment model.",
+    "rows_written_total": "Rows written to CSV files.",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """
+    Thread-safe counters and per-stage timings for one process.
+
+    Counters are keyed by name plus labels (e.g. status="200"); stages keep
+    count, total and max seconds. Everything is cumulative since creation
+    (or reset()), which is what the Prometheus file format expects.
+    Stage totals add up across threads, so concurrent fetches can sum to
+    more than the run's wall time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._counters = {}
+            self._stages = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the with-block as one occurrence of `name` (also when it raises).
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        """
+        Returns a JSON-ready dict of everything recorded so far.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            stages = {name: list(entry) for name, entry in self._stages.items()}
+            started_at = self.started_at
+
+        grouped = {}
+        for (name, labels), value in sorted(counters.items()):
+            label_text = ",".join(f"{k}={v}" for k, v in labels) or "total"
+            grouped.setdefault(name, {})[label_text] = value
+        return {
+            "started_at": datetime.fromtimestamp(started_at).isoformat(timespec="seconds"),
+            "duration_seconds": time.time() - started_at,
+            "stages": {
+                name: {"count": count, "total_seconds": total, "mean_seconds": total / count if count else 0.0,
+                       "max_seconds": peak}
+                for name, (count, total, peak) in sorted(stages.items(), key=lambda item: -item[1][1])
+            },
+            "counters": grouped
+        }
+
+    def to_prometheus(self, run=None):
+        """
+        Renders everything in the Prometheus text exposition format, e.g. for
+        node_exporter's textfile collector. `run` becomes a label on every series.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            stages = {name: list(entry) for name, entry in self._stages.items()}
+
+        base = {"run": run} if run else {}
+
+        def fmt(labels):
+            labels = {**base, **dict(labels)}
+            if not labels:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in labels.values())
+            return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            metric = PROM_PREFIX + name
+            lines.append(f"# HELP {metric} {DESCRIPTIONS.get(name, name.replace('_', ' '))}")
+            lines.append(f"# TYPE {metric} counter")
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f"{metric}{fmt(labels)} {value}")
+
+        if stages:
+            metric = PROM_PREFIX + "stage_seconds"
+            lines.append(f"# HELP {metric} Wall time spent per pipeline stage.")
+            lines.append(f"# TYPE {metric} summary")
+            for name, (count, total, _) in sorted(stages.items()):
+                lines.append(f"{metric}_sum{fmt([('stage', name)])} {total:.6f}")
+                lines.append(f"{metric}_count{fmt([('stage', name)])} {count}")
+            metric = PROM_PREFIX + "stage_max_seconds"
+            lines.append(f"# HELP {metric} Longest single occurrence per pipeline stage.")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, (_, _, peak) in sorted(stages.items()):
+                lines.append(f"{metric}{fmt([('stage', name)])} {peak:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, run, output_dir=METRICS_DIR, latest=False):
+        """
+        Writes a timestamped JSON report (<run>_<time>.json, or
+        <run>_latest.json with `latest`) and overwrites <run>.prom.
+        Returns (json_path, prom_path), or None when output_dir is empty.
+        """
+        if not output_dir:
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+        report = {"run": run, "pid": os.getpid(), **self.snapshot()}
+        suffix = "latest" if latest else datetime.now().strftime('%Y%m%d_%H%M%S')
+        json_path = os.path.join(output_dir, f"{run}_{suffix}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        # Written aside and renamed, so a scraper never reads a half file.
+        prom_path = os.path.join(output_dir, f"{run}.prom")
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(run))
+        os.replace(prom_path + ".tmp", prom_path)
+        return json_path, prom_path
+
+
+registry = Metrics()
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(stage, seconds):
+    registry.observe(stage, seconds)
+
+
+def stage(name):
+    return registry.stage(name)
+
+
+class Profiler:
+    """
+    Opt-in profiler for one run: "cprofile" (stdlib, writes a .prof file
+    for pstats/snakeviz) or "pyinstrument" (writes an .html call tree;
+    needs pip install pyinstrument). Only the thread that called start()
+    is profiled.
+    """
+
+    def __init__(self, mode):
+        if mode not in PROFILERS:
+            raise ValueError(f"Unknown profiler {mode!r}, expected one of {PROFILERS}")
+        self.mode = mode
+        if mode == "pyinstrument":
+            try:
+                from pyinstrument import Profiler as PyinstrumentProfiler
+            except ImportError as e:
+                raise ImportError("PROFILE_RUN=pyinstrument needs: pip install pyinstrument") from e
+            self._profiler = PyinstrumentProfiler()
+        else:
+            import cProfile
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if self.mode == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+        return self
+
+    def stop(self, run, output_dir=METRICS_DIR):
+        """
+        Stops profiling and writes the result. Returns the file path.
+        """
+        os.makedirs(output_dir or ".", exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if self.mode == "pyinstrument":
+            self._profiler.stop()
+            path = os.path.join(output_dir or ".", f"{run}_{stamp}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            path = os.path.join(output_dir or ".", f"{run}_{stamp}.prof")
+            self._profiler.dump_stats(path)
+        return path
+
+
+def start_run(run, output_dir=METRICS_DIR, profile=PROFILE):
+    """
+    For command-line scripts: starts the PROFILE_RUN profiler if one is
+    requested and, when the process exits (normally or via exit()), writes
+    the run report and the profile and prints where they went.
+    """
+    registry.reset()
+    profiler = Profiler(profile).start() if profile else None
+
+    def finish():
+        if profiler is not None:
+            print(f"🔬 Profile: {profiler.stop(run, output_dir)}")
+        paths = registry.write(run, output_dir)
+        if paths:
+            print(f"⏱️  Run metrics: {paths[0]} (+ {paths[1]})")
+
+    atexit.register(finish)
+
+
+class ReportWriter:
+    """
+    For long-running processes (the dashboard): rewrites the report files
+    every `interval` seconds from a daemon thread, if anything changed.
+    Keeps a single JSON file (<run>_latest.json) instead of one per write.
+    """
+
+    def __init__(self, run, interval=60, output_dir=METRICS_DIR):
+        self.run = run
+        self.interval = interval
+        self.output_dir = output_dir
+        self._last = None
+        if output_dir:
+            threading.Thread(target=self._loop, name="metrics-writer", daemon=True).start()
+
+    def write(self):
+        snapshot = registry.snapshot()
+        state = (snapshot["counters"], {k: v["count"] for k, v in snapshot["stages"].items()})
+        if state != self._last:
+            self._last = state
+            registry.write(self.run, self.output_dir, latest=True)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except Exception:
+                logger.exception("Writing metrics failed")
@@ -0,0 +1,170 @@
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import sentiment_engine
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.7
+# Representatives kept per index (~1.7 KB each) before the least recently matched are dropped.
+MAX_CLUSTERS = 20000
+# Grams hashed per MinHash chunk; bounds the (NUM_PERM x chunk) work matrix to ~100 MB.
+CHUNK_GRAMS = 200000
+
+_LOW_32 = np.uint64(0xFFFFFFFF)
+_SHIFT_32 = np.uint64(32)
+_MENTION = re.compile(r"@\w+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_NON_WORD = re.compile(r"[^\w\s$#@]+")
+
+
+def spam_normalize(text):
+    """
+    Normalizes away what spam variants usually change: tickers, case and
+    whitespace (as in sentiment_engine.normalize_text), plus @mentions,
+    numbers/prices and emoji or other symbols.
+    """
+    text = _MENTION.sub("@user", text or "")
+    text = _NUMBER.sub("#", text)
+    text = _NON_WORD.sub(" ", text)
+    return sentiment_engine.normalize_text(text)
+
+
+def _gram_hashes(texts):
+    """
+    Hashes every SHINGLE_SIZE-byte window of every text in one vectorized pass.
+    Returns (grams, starts): grams of text i are grams[starts[i]:starts[i + 1]].
+    """
+    encoded = [spam_normalize(t).encode("utf-8").ljust(SHINGLE_SIZE) for t in texts]
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+
+    positions = len(buf) - SHINGLE_SIZE + 1
+    rolled = np.zeros(max(positions, 0), dtype=np.uint64)
+    for k in range(SHINGLE_SIZE):
+        rolled = rolled * np.uint64(257) + buf[k:k + positions]
+
+    # Keep only windows that start and end inside the same text.
+    gram_counts = lengths - SHINGLE_SIZE + 1
+    text_offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    gram_positions = np.repeat(text_offsets, gram_counts) + (
+        np.arange(gram_counts.sum()) - np.repeat(np.concatenate(([0], np.cumsum(gram_counts)[:-1])), gram_counts)
+    )
+    rolled = rolled[gram_positions]
+    grams = (rolled ^ (rolled >> _SHIFT_32)) & _LOW_32
+    starts = np.concatenate(([0], np.cumsum(gram_counts)))
+    return grams, starts
+
+
+class NearDuplicateIndex:
+    """
+    Incremental MinHash/LSH index that groups near-identical messages.
+
+    assign() gives every text a cluster id; texts whose estimated Jaccard
+    similarity with a cluster's representative reaches `threshold` join that
+    cluster, everything else starts a new one. Only representatives are kept
+    (a signature plus one bucket entry per band), and at most `max_clusters`
+    of them: the least recently matched are dropped, with their `results`,
+    at the start of the next assign(), so memory stays flat on long runs.
+    A dropped cluster that shows up again gets a new id.
+    `results` maps cluster id -> classification of its representative.
+    assign() is safe to call from several threads.
+    """
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, seed=1, max_clusters=MAX_CLUSTERS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_clusters = max_clusters
+
+        # Multiply-shift hashing: (a * x + b) mod 2**64, keeping the top 32 bits.
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+        self._buckets = [dict() for _ in range(bands)]
+        # cluster id -> (signature, band keys), least recently matched first.
+        self._representatives = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.results = {}
+
+    def signatures(self, texts):
+        """
+        Returns the (len(texts), num_perm) MinHash signature matrix.
+        """
+        if not texts:
+            return np.zeros((0, self.num_perm), dtype=np.uint32)
+        grams, starts = _gram_hashes(texts)
+        sigs = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+
+        first = 0
+        while first < len(texts):
+            # Take as many whole texts as fit in one chunk (at least one).
+            last = int(np.searchsorted(starts, starts[first] + CHUNK_GRAMS, side="right")) - 1
+            last = min(max(last, first + 1), len(texts))
+            chunk = grams[starts[first]:starts[last]]
+            hashed = ((self._a * chunk + self._b) >> _SHIFT_32).astype(np.uint32)
+            sigs[first:last] = np.minimum.reduceat(hashed, starts[first:last] - starts[first], axis=1).T
+            first = last
+        return sigs
+
+    def _band_keys(self, sigs):
+        keys = np.zeros((len(sigs), self.bands), dtype=np.uint64)
+        for r in range(self.rows):
+            keys = keys * np.uint64(1000003) + sigs[:, r::self.rows]
+        return keys
+
+    def _evict(self):
+        while len(self._representatives) > self.max_clusters:
+            cluster, (_, keys) = self._representatives.popitem(last=False)
+            for band, key in enumerate(keys.tolist()):
+                if self._buckets[band].get(key) == cluster:
+                    del self._buckets[band][key]
+            self.results.pop(cluster, None)
+
+    def assign(self, texts):
+        """
+        Returns one cluster id per text, adding new clusters as needed.
+        """
+        sigs = self.signatures(texts)
+        key_matrix = self._band_keys(sigs)
+        with self._lock:
+            # Evicting before assigning keeps the ids handed out by the previous
+            # call alive until its caller has stored their results.
+            self._evict()
+            return self._assign(sigs, key_matrix)
+
+    def _assign(self, sigs, key_matrix):
+        cluster_ids = []
+
+        for i, keys in enumerate(key_matrix.tolist()):
+            cluster = None
+            tried = set()
+            for band, key in enumerate(keys):
+                candidate = self._buckets[band].get(key)
+                if candidate is None or candidate in tried:
+                    continue
+                tried.add(candidate)
+                agreement = np.count_nonzero(sigs[i] == self._representatives[candidate][0]) / self.num_perm
+                if agreement >= self.threshold:
+                    cluster = candidate
+                    self._representatives.move_to_end(cluster)
+                    break
+
+            if cluster is None:
+                cluster = self._next_id
+                self._next_id += 1
+                self._representatives[cluster] = (sigs[i].copy(), key_matrix[i].copy())
+                for band, key in enumerate(keys):
+                    self._buckets[band].setdefault(key, cluster)
+            cluster_ids.append(cluster)
+
+        return cluster_ids
+
+    def __len__(self):
+        return len(self._representatives)
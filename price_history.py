@@ -0,0 +1,76 @@
+import os
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import http_client
+
+WINDOW_DAYS = 30
+MAX_WORKERS = int(os.getenv("PRICE_FETCH_WORKERS", "4"))
+
+
+def date_windows(start_date, end_date, window_days=WINDOW_DAYS):
+    """
+    Splits [start_date, end_date) into consecutive windows of at most
+    `window_days` days.
+    """
+    windows = []
+    curr_date = start_date
+    while curr_date < end_date:
+        batch_end = min(curr_date + timedelta(days=window_days), end_date)
+        windows.append((curr_date, batch_end))
+        curr_date = batch_end
+    return windows
+
+
+def fetch_window(target_url, headers, start_date, end_date):
+    """
+    Fetches one window of daily bars.
+    Returns (status_code, rows, error); status_code is None on connection errors.
+    """
+    params = {
+        "period": "HS_PERIOD_DAILY",
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "limit": 50,
+        "page": 1
+    }
+
+    try:
+        response = http_client.get(target_url, headers=headers, params=params)
+        if response.status_code != 200:
+            return response.status_code, [], None
+        rows = response.json().get('data', {}).get('result', [])
+    except Exception as e:
+        return None, [], e
+
+    return 200, rows or [], None
+
+
+def fetch_price_history(target_url, headers, start_date, end_date, max_workers=MAX_WORKERS, on_window=None):
+    """
+    Fetches all windows between start_date and end_date concurrently.
+    Request pacing and retries are left to the shared http_client.
+
+    `on_window(start, end, status_code, rows, error)` is called from the
+    calling thread as each window completes, so it may touch UI state.
+    Returns (rows, status_codes) with rows concatenated in date-window order.
+    """
+    windows = date_windows(start_date, end_date)
+    results = [None] * len(windows)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(fetch_window, target_url, headers, start, end): idx
+            for idx, (start, end) in enumerate(windows)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            status_code, rows, error = future.result()
+            results[idx] = (status_code, rows)
+            if on_window:
+                start, end = windows[idx]
+                on_window(start, end, status_code, rows, error)
+
+    all_rows = []
+    for _, rows in results:
+        all_rows.extend(rows)
+    return all_rows, [status_code for status_code, _ in results]
@@ -0,0 +1,259 @@
+import os
+import sqlite3
+import pandas as pd
+from datetime import datetime, timedelta
+
+import metrics
+import price_history
+
+STORE_PATH = os.path.join("data", "price_store.db")
+OVERLAP_DAYS = 5
+# Windows that failed to download, per ticker; re-requested on the next refresh.
+GAPS_TABLE = "fetch_gaps"
+
+
+def _table_name(ticker):
+    ticker = ticker.upper()
+    if not ticker.isalnum():
+        raise ValueError(f"Invalid ticker symbol: {ticker!r}")
+    return f"prices_{ticker}"
+
+
+def _connect(db_path):
+    folder = os.path.dirname(db_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    return sqlite3.connect(db_path, timeout=30)
+
+
+def load_prices(ticker, db_path=STORE_PATH):
+    """
+    Returns every stored daily bar for `ticker`, oldest first.
+    Returns an empty DataFrame if nothing has been stored yet.
+    """
+    table = _table_name(ticker)
+    conn = _connect(db_path)
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if not exists:
+            return pd.DataFrame()
+        return pd.read_sql_query(f'SELECT * FROM "{table}" ORDER BY date', conn)
+    finally:
+        conn.close()
+
+
+def stored_tickers(db_path=STORE_PATH):
+    """
+    Returns the tickers that have stored bars.
+    """
+    if not os.path.exists(db_path):
+        return []
+    conn = _connect(db_path)
+    try:
+        names = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'prices_%'").fetchall()
+    finally:
+        conn.close()
+    return sorted(name[len("prices_"):] for (name,) in names)
+
+
+def load_closes(tickers, db_path=STORE_PATH, since=None):
+    """
+    Returns stored closing prices as one DataFrame: a row per trading date
+    (naive, normalized to midnight, oldest first), a column per ticker, NaN
+    where a ticker has no bar. Tickers without stored bars are left out.
+    `since` (a datetime) drops older dates.
+    """
+    wanted = set(t.upper() for t in tickers) & set(stored_tickers(db_path))
+    query_tail = ""
+    params = ()
+    if since is not None:
+        # Stored dates are ISO strings, so a string bound works for any time/zone suffix.
+        query_tail = " WHERE date >= ?"
+        params = (since.strftime("%Y-%m-%d"),)
+
+    names, dates, closes = [], [], []
+    conn = _connect(db_path)
+    try:
+        for ticker in sorted(wanted):
+            rows = conn.execute(f'SELECT date, close FROM "{_table_name(ticker)}"{query_tail}', params).fetchall()
+            names.extend([ticker] * len(rows))
+            dates.extend(row[0] for row in rows)
+            closes.extend(row[1] for row in rows)
+    finally:
+        conn.close()
+
+    if not names:
+        return pd.DataFrame()
+    frame = pd.DataFrame({
+        "ticker": names,
+        "date": pd.to_datetime(pd.Series(dates)).dt.tz_localize(None).dt.normalize(),
+        "close": pd.to_numeric(pd.Series(closes), errors="coerce")
+    })
+    frame = frame.drop_duplicates(subset=["ticker", "date"], keep="last")
+    return frame.pivot(index="date", columns="ticker", values="close").sort_index()
+
+
+def last_dates(tickers, db_path=STORE_PATH):
+    """
+    Returns {ticker: date of its newest stored bar}, dates normalized like
+    load_closes. Tickers without stored bars are left out.
+    """
+    wanted = set(t.upper() for t in tickers) & set(stored_tickers(db_path))
+    found = {}
+    conn = _connect(db_path)
+    try:
+        for ticker in sorted(wanted):
+            row = conn.execute(f'SELECT MAX(date) FROM "{_table_name(ticker)}"').fetchone()
+            if row and row[0]:
+                found[ticker] = row[0]
+    finally:
+        conn.close()
+    if not found:
+        return {}
+    dates = pd.to_datetime(pd.Series(list(found.values()))).dt.tz_localize(None).dt.normalize()
+    return dict(zip(found, dates))
+
+
+def save_prices(ticker, df, db_path=STORE_PATH):
+    """
+    Replaces the stored history of `ticker` with `df`.
+    """
+    table = _table_name(ticker)
+    conn = _connect(db_path)
+    try:
+        with metrics.stage("store_write"):
+            df.to_sql(table, conn, if_exists="replace", index=False)
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def merge_prices(stored, fresh):
+    """
+    Merges freshly fetched bars into the stored ones.
+    Fresh bars win on the same date, so late corrections overwrite old values.
+    """
+    frames = [df for df in (stored, fresh) if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    if 'date' not in merged.columns:
+        return merged
+    return merged.drop_duplicates(subset=['date'], keep='last').sort_values('date').reset_index(drop=True)
+
+
+def load_gaps(ticker, db_path=STORE_PATH):
+    """
+    Returns the (start, end) windows of `ticker` that failed to download
+    and have not been fetched successfully since.
+    """
+    conn = _connect(db_path)
+    try:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {GAPS_TABLE} (ticker TEXT, start TEXT, end TEXT)")
+        rows = conn.execute(
+            f"SELECT start, end FROM {GAPS_TABLE} WHERE ticker = ? ORDER BY start", (ticker.upper(),)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(datetime.fromisoformat(start), datetime.fromisoformat(end)) for start, end in rows]
+
+
+def save_gaps(ticker, gaps, db_path=STORE_PATH):
+    """
+    Replaces the recorded failed windows of `ticker` with `gaps`.
+    """
+    ticker = ticker.upper()
+    conn = _connect(db_path)
+    try:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {GAPS_TABLE} (ticker TEXT, start TEXT, end TEXT)")
+        conn.execute(f"DELETE FROM {GAPS_TABLE} WHERE ticker = ?", (ticker,))
+        conn.executemany(
+            f"INSERT INTO {GAPS_TABLE} (ticker, start, end) VALUES (?, ?, ?)",
+            [(ticker, start.isoformat(), end.isoformat()) for start, end in gaps]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(stored, start_date, end_date, overlap_days=OVERLAP_DAYS, gaps=()):
+    """
+    Returns the (start, end) ranges that still need fetching: the part of the
+    request older than the stored history, everything after the last
+    stored bar (re-fetching `overlap_days` before it), and any previously
+    failed windows in `gaps`. Overlapping ranges are merged.
+    """
+    if stored.empty or 'date' not in stored.columns:
+        return _merge_ranges([(start_date, end_date)] + list(gaps))
+
+    dates = pd.to_datetime(stored['date']).dt.tz_localize(None)
+    first_bar = dates.min().to_pydatetime()
+    last_bar = dates.max().to_pydatetime()
+
+    ranges = list(gaps)
+    if start_date < first_bar:
+        ranges.append((start_date, first_bar))
+    delta_start = max(start_date, last_bar - timedelta(days=overlap_days))
+    if delta_start < end_date:
+        ranges.append((delta_start, end_date))
+    return _merge_ranges(ranges)
+
+
+def refresh_prices(ticker, target_url, headers, start_date, end_date, db_path=STORE_PATH, on_window=None):
+    """
+    Brings the stored history of `ticker` up to date and returns the bars
+    between start_date and end_date, oldest first.
+
+    Only the missing ranges are requested from upstream. Windows that fail
+    are recorded as gaps and requested again on the next refresh, so a
+    hole inside the stored history does not become permanent. Nothing is
+    written if upstream rejects the token (401).
+    Returns (df, status_codes).
+    """
+    stored = load_prices(ticker, db_path=db_path)
+    gaps = load_gaps(ticker, db_path=db_path)
+
+    fresh_rows = []
+    status_codes = []
+    failed = []
+
+    def track(start, end, status_code, rows, error):
+        if status_code != 200:
+            failed.append((start, end))
+        if on_window:
+            on_window(start, end, status_code, rows, error)
+
+    for range_start, range_end in missing_ranges(stored, start_date, end_date, gaps=gaps):
+        rows, codes = price_history.fetch_price_history(
+            target_url, headers, range_start, range_end, on_window=track
+        )
+        fresh_rows.extend(rows)
+        status_codes.extend(codes)
+
+    if 401 in status_codes:
+        return pd.DataFrame(), status_codes
+
+    merged = merge_prices(stored, pd.DataFrame(fresh_rows))
+    if fresh_rows:
+        save_prices(ticker, merged, db_path=db_path)
+    if failed or gaps:
+        save_gaps(ticker, _merge_ranges(failed), db_path=db_path)
+
+    if merged.empty or 'date' not in merged.columns:
+        return merged, status_codes
+
+    dates = pd.to_datetime(merged['date']).dt.tz_localize(None)
+    in_range = dates >= start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return merged[in_range].reset_index(drop=True), status_codes
@@ -0,0 +1,178 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+import price_store
+import stock_data
+
+LOOKBACK_DAYS = 250
+MIN_PERIODS = 20
+REFRESH_SECONDS = 600
+
+
+def _stats(returns):
+    """
+    Sufficient statistics for pairwise-complete correlation of a
+    (dates x tickers) return matrix with NaN gaps, as four (tickers x tickers)
+    matrices. Entry [i, j] only counts dates where both i and j have a return:
+    n (overlap count), s (sum of i's returns), ss (sum of i's squares),
+    xy (sum of i*j). They add up across row blocks, so rows can be added
+    or removed without a full recompute.
+    """
+    present = (~np.isnan(returns)).astype(np.float64)
+    values = np.where(present > 0, returns, 0.0)
+    return {
+        "n": present.T @ present,
+        "s": values.T @ present,
+        "ss": (values * values).T @ present,
+        "xy": values.T @ values
+    }
+
+
+def _correlation(stats, min_periods):
+    n = stats["n"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_term = stats["s"] * stats["s"].T / n
+        cov = stats["xy"] - mean_term
+        var = stats["ss"] - stats["s"] ** 2 / n
+        corr = cov / np.sqrt(var * var.T)
+    corr[n < min_periods] = np.nan
+    np.fill_diagonal(corr, 1.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+class CorrelationEngine:
+    """
+    Correlation matrix of daily log returns for every ticker with stored bars.
+
+    The last `lookback` return rows are kept as a (dates x tickers) matrix
+    together with its sufficient statistics, and the date of each ticker's
+    newest bar. refresh() finds the tickers whose store has moved past that
+    date, re-reads every row from the oldest such date on (so bars that
+    arrive late for dates already in the matrix are picked up), swaps the
+    old rows' statistics for the new ones and subtracts the rows that fall
+    out of the window. It rebuilds from scratch when the ticker set changes
+    or a ticker fell behind the start of the window. Correlations are
+    pairwise-complete and need at least `min_periods` overlapping days,
+    else they are NaN.
+    """
+
+    def __init__(self, db_path=price_store.STORE_PATH, lookback=LOOKBACK_DAYS, min_periods=MIN_PERIODS):
+        self.db_path = db_path
+        self.lookback = lookback
+        self.min_periods = min_periods
+        self.tickers = []
+        self.dates = pd.DatetimeIndex([])
+        self.returns = np.empty((0, 0))
+        self.corr = np.empty((0, 0))
+        self.updated_at = 0.0
+        self._index = {}
+        self._last_bars = {}
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def _rebuild(self, tickers):
+        closes = price_store.load_closes(tickers, db_path=self.db_path)
+        tickers = list(closes.columns)
+        log_closes = np.log(closes.to_numpy(dtype=np.float64))
+        returns = np.diff(log_closes, axis=0)[-self.lookback:]
+        self.tickers = tickers
+        self._index = {t: i for i, t in enumerate(tickers)}
+        self.dates = closes.index[1:][-self.lookback:] if len(closes) > 1 else pd.DatetimeIndex([])
+        self.returns = returns.reshape(len(self.dates), len(tickers))
+        self._last_bars = closes.apply(pd.Series.last_valid_index).to_dict() if len(closes) else {}
+        self._stats = _stats(self.returns)
+
+    def _update(self):
+        latest = price_store.last_dates(self.tickers, db_path=self.db_path)
+        behind = [self._last_bars.get(t) for t, date in latest.items()
+                  if self._last_bars.get(t) is None or date > self._last_bars[t]]
+        if not behind:
+            return 0
+        if any(date is None for date in behind) or not len(self.dates) or min(behind) < self.dates[0]:
+            self._rebuild(self.tickers)
+            return len(self.dates)
+
+        # Every return after `start` may change; the close on `start` anchors the first one.
+        start = min(behind)
+        closes = price_store.load_closes(self.tickers, db_path=self.db_path, since=start)
+        closes = closes.reindex(columns=self.tickers)
+        log_closes = np.log(closes.to_numpy(dtype=np.float64))
+        rows = np.diff(log_closes, axis=0)
+
+        keep = self.dates <= start
+        removed = _stats(self.returns[~keep])
+        added = _stats(rows)
+        for key in self._stats:
+            self._stats[key] += added[key] - removed[key]
+        returns = np.vstack([self.returns[keep], rows])
+        dates = self.dates[keep].append(closes.index[1:])
+
+        overflow = len(returns) - self.lookback
+        if overflow > 0:
+            removed = _stats(returns[:overflow])
+            for key in self._stats:
+                self._stats[key] -= removed[key]
+            returns, dates = returns[overflow:], dates[overflow:]
+
+        self.returns, self.dates = returns, dates
+        for ticker, date in closes.apply(pd.Series.last_valid_index).items():
+            if date is not None and not pd.isna(date):
+                self._last_bars[ticker] = date
+        return len(rows)
+
+    def refresh(self, tickers=None):
+        """
+        Brings the matrix up to date with the price store, for `tickers`
+        (default: the sector universe). Returns the number of tickers covered.
+        """
+        wanted = sorted(set(t.upper() for t in (tickers or stock_data.SECTOR_DATABASE))
+                        & set(price_store.stored_tickers(self.db_path)))
+        with self._lock:
+            if wanted != self.tickers or self._stats is None:
+                self._rebuild(wanted)
+            else:
+                self._update()
+            self.corr = _correlation(self._stats, self.min_periods)
+            self.updated_at = time.time()
+            return len(self.tickers)
+
+    def refresh_if_stale(self, max_age=REFRESH_SECONDS, tickers=None):
+        if time.time() - self.updated_at > max_age:
+            self.refresh(tickers)
+
+    def correlation(self, a, b):
+        """
+        Correlation of two tickers' returns, or NaN if unknown.
+        """
+        i, j = self._index.get(a.upper()), self._index.get(b.upper())
+        if i is None or j is None:
+            return float("nan")
+        return float(self.corr[i, j])
+
+    def rank_candidates(self, watchlist, current_sector, count=3):
+        """
+        Returns up to `count` (ticker, mean correlation) pairs from sectors
+        other than `current_sector` and outside `watchlist`, lowest mean
+        correlation to the watchlist tickers first. Tickers without enough
+        overlapping history are left out.
+        """
+        with self._lock:
+            index, corr, tickers = self._index, self.corr, self.tickers
+        watch_idx = [index[t] for t in {t.upper() for t in watchlist} if t in index]
+        if not watch_idx:
+            return []
+
+        excluded = {t.upper() for t in watchlist}
+        eligible = np.array([
+            i for i, t in enumerate(tickers)
+            if t not in excluded and stock_data.get_ticker_sector(t) != current_sector
+        ], dtype=np.int64)
+        if not len(eligible):
+            return []
+
+        block = corr[np.ix_(eligible, watch_idx)]
+        known = ~np.isnan(block)
+        scores = np.where(known.any(axis=1), np.nansum(block, axis=1) / np.maximum(known.sum(axis=1), 1), np.nan)
+        order = [k for k in np.argsort(scores) if not np.isnan(scores[k])][:count]
+        return [(tickers[eligible[k]], float(scores[k])) for k in order]
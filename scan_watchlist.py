@@ -0,0 +1,307 @@
+import os
+import queue
+import argparse
+import threading
+import pandas as pd
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import stock_data
+import http_client
+import sentiment_engine
+import sentiment_cache
+import near_duplicates
+import inference_pool
+import stream_scraper
+import stream_store
+import price_store
+import metrics
+
+DEFAULT_WORKERS = 4
+# Fetched pages waiting for classification before fetchers block.
+QUEUED_PAGES = 32
+# label_rows calls kept in flight per inference worker process.
+CALLS_PER_INFERENCE_WORKER = 2
+
+
+def read_ticker_file(path):
+    with open(path, "r") as f:
+        return [line.strip().upper() for line in f.readlines() if line.strip()]
+
+
+def resolve_tickers(args):
+    """
+    Builds the ticker list from the CLI arguments, keeping first-seen order.
+    """
+    tickers = [t.upper() for t in args.tickers]
+    if args.file:
+        tickers += read_ticker_file(args.file)
+    if args.all_sectors:
+        tickers += list(stock_data.SECTOR_DATABASE.keys())
+    return list(dict.fromkeys(tickers))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scan stream sentiment for many tickers without prompts.")
+    parser.add_argument("tickers", nargs="*", help="Tickers to scan, e.g. BBCA GOTO")
+    parser.add_argument("--file", help="Text file with one ticker per line (e.g. my_watchlist.txt)")
+    parser.add_argument("--all-sectors", action="store_true", help="Scan every ticker in the sector universe file")
+    parser.add_argument("--days", type=int, default=30, help="Days of stream history per ticker (default 30)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Tickers fetched in parallel")
+    parser.add_argument("--inference-workers", type=int, default=0,
+                        help="Classify in this many worker processes, each with its own model copy "
+                             "(default 0: in this process)")
+    parser.add_argument("--threads-per-worker", type=int,
+                        help="Torch threads per inference worker (default: CPU count / inference workers)")
+    parser.add_argument("--rps", type=float, default=http_client.REQUESTS_PER_SECOND,
+                        help="Global request rate limit (requests/sec); lowered automatically when throttled")
+    parser.add_argument("--output-dir", default="scans", help="Folder for the summary and per-ticker CSVs")
+    parser.add_argument("--full", action="store_true", help="Ignore stored history and rescan every window")
+    parser.add_argument("--price-days", type=int, default=0,
+                        help="Also refresh this many days of daily bars per ticker into the price store "
+                             "(feeds the dashboard's correlation ranking; needs TARGET_PRICE_URL)")
+    parser.add_argument("--count-clusters-once", action="store_true",
+                        help="Count each cluster of near-duplicate messages (spam, cross-posts) once in the stats")
+    return parser.parse_args()
+
+
+def main():
+    load_dotenv()
+    args = parse_args()
+    metrics.start_run("scan_watchlist")
+
+    auth_token = os.getenv("TARGET_AUTH_TOKEN")
+    base_url_env = os.getenv("TARGET_STREAM_URL")
+    if not auth_token or not base_url_env:
+        print("ERROR: TARGET_AUTH_TOKEN and TARGET_STREAM_URL must be set in .env")
+        return 1
+
+    tickers = resolve_tickers(args)
+    if not tickers:
+        print("ERROR: No tickers given. Pass tickers, --file or --all-sectors.")
+        return 1
+
+    print(f"Loading AI Model from: {sentiment_engine.MODEL_PATH}...")
+    try:
+        with metrics.stage("model_load"):
+            if args.inference_workers > 0:
+                stock_classifier = inference_pool.InferencePool(args.inference_workers,
+                                                                threads=args.threads_per_worker).start()
+            else:
+                stock_classifier = sentiment_engine.load_classifier()
+        if isinstance(stock_classifier, inference_pool.InferencePool):
+            print(f"🧠 {stock_classifier.workers} inference workers x {stock_classifier.threads} threads")
+    except Exception as e:
+        print(f"❌ ERROR Loading AI Model: {e}")
+        return 1
+
+    try:
+        return scan(args, tickers, stock_classifier)
+    finally:
+        if isinstance(stock_classifier, inference_pool.InferencePool):
+            stock_classifier.close()
+
+
+def scan(args, tickers, stock_classifier):
+    auth_token = os.getenv("TARGET_AUTH_TOKEN")
+    base_url_env = os.getenv("TARGET_STREAM_URL")
+
+    try:
+        message_cache = sentiment_cache.SentimentCache()
+    except Exception as e:
+        message_cache = None
+        print(f"⚠️ Sentiment cache disabled: {e}")
+
+    store = None if args.full else stream_store.StreamStore()
+    http_client.configure(rate=args.rps)
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Authorization": auth_token
+    }
+    cutoff_date = datetime.now() - timedelta(days=args.days)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print(f"Scanning {len(tickers)} tickers | {args.days} days | {args.workers} workers | {args.rps} req/s")
+    print("-" * 30)
+
+    price_url_env = os.getenv("TARGET_PRICE_URL")
+    if args.price_days and not price_url_env:
+        print("⚠️ TARGET_PRICE_URL not set, skipping --price-days.")
+
+    # Fetchers push pages here and block while it is full, so a slow model
+    # throttles fetching instead of pages piling up in memory.
+    pages = queue.Queue(maxsize=QUEUED_PAGES)
+    stopping = threading.Event()
+
+    def put(item):
+        while not stopping.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+        raise RuntimeError("scan stopped")
+
+    def fetch(ticker):
+        try:
+            result = {}
+            walk = stream_scraper.iter_ticker(f"{base_url_env}/{ticker}", headers, cutoff_date,
+                                              state=store.get_state(ticker) if store else None, result=result)
+            for page_rows, _ in walk:
+                if page_rows:
+                    put((ticker, page_rows, None))
+            new_state, outcome = result["state"], result["outcome"]
+        except Exception as e:
+            if stopping.is_set():
+                return
+            new_state, outcome = None, {"reason": "error", "error": e, "status_code": None}
+        malformed = result.get("malformed", 0)
+
+        price_bars = None
+        if args.price_days and price_url_env:
+            now = datetime.now()
+            try:
+                df, _ = price_store.refresh_prices(ticker, f"{price_url_env}/{ticker}", headers,
+                                                   now - timedelta(days=args.price_days), now)
+                price_bars = len(df)
+            except Exception:
+                price_bars = 0
+        put((ticker, None, (new_state, outcome, price_bars, malformed)))
+
+    # Shared across tickers so cross-posted spam is classified once per run.
+    inference_clusters = near_duplicates.NearDuplicateIndex()
+    # One page per call in flight for a single in-process model (it must not
+    # run concurrently); with an inference pool, enough calls to keep every
+    # worker busy even when each ticker only has a page or two of news.
+    if isinstance(stock_classifier, inference_pool.InferencePool):
+        label_slots = stock_classifier.workers * CALLS_PER_INFERENCE_WORKER
+    else:
+        label_slots = 1
+    in_flight = threading.BoundedSemaphore(label_slots)
+
+    def open_output(ticker):
+        csv_filename = os.path.join(args.output_dir, f"stream_{ticker}_{args.days}days_AI_Analytics.csv")
+        writer = stream_scraper.ChunkedCsvWriter(csv_filename, stream_store.COLUMNS)
+        tally = stream_scraper.SentimentTally(
+            near_dupes=near_duplicates.NearDuplicateIndex() if args.count_clusters_once else None
+        )
+        return writer, tally
+
+    def new_entry(ticker):
+        entry = {"labels": [], "new": 0, "result": None}
+        if not store:
+            # --full keeps nothing: labeled pages go straight to the CSV and tally.
+            entry["writer"], entry["tally"] = open_output(ticker)
+            entry.update(lock=threading.Lock(), pending={}, written=0)
+        return entry
+
+    def write_page(entry, seq, page_rows):
+        # Pages can finish labeling out of order; they are written in fetch
+        # order, holding only the pages that finished ahead of an earlier one.
+        with entry["lock"]:
+            entry["pending"][seq] = page_rows
+            while entry["written"] in entry["pending"]:
+                rows = entry["pending"].pop(entry["written"])
+                entry["writer"].write(rows)
+                entry["tally"].add(rows)
+                entry["written"] += 1
+
+    def label(ticker, entry, seq, page_rows):
+        try:
+            sentiment_engine.label_rows(stock_classifier, page_rows, cache=message_cache,
+                                        near_dupes=inference_clusters)
+            if store:
+                store.save_messages(ticker, page_rows)
+            else:
+                write_page(entry, seq, page_rows)
+        finally:
+            in_flight.release()
+
+    def finish(ticker, entry):
+        for future in entry["labels"]:
+            future.result()
+        new_state, outcome, price_bars, malformed = entry["result"]
+        if store:
+            if new_state:
+                store.set_state(ticker, new_state)
+            writer, tally = open_output(ticker)
+            for chunk in store.iter_messages(ticker, since=cutoff_date):
+                writer.write(chunk)
+                tally.add(chunk)
+        else:
+            writer, tally = entry["writer"], entry["tally"]
+        writer.close()
+        if not tally.messages:
+            os.remove(writer.filename)
+
+        stats = tally.summary()
+        status = "ok" if outcome["reason"] != "error" else f"error {outcome.get('status_code') or outcome.get('error')}"
+        summary.append({
+            "ticker": ticker,
+            "sector": stock_data.get_ticker_sector(ticker),
+            "new_messages": entry["new"],
+            "malformed": malformed,
+            "status": status,
+            "price_bars": price_bars,
+            **stats
+        })
+        skipped = f", {malformed} malformed skipped" if malformed else ""
+        print(f"{ticker}: +{entry['new']} new{skipped}, {stats['messages']} in window, {stats['dominant']} ({status})")
+
+    summary = []
+    # ticker -> pages handed to the labelers, the --full output, and the
+    # fetcher's final (state, outcome, price_bars, malformed) once its walk is over.
+    open_tickers = {}
+    fetchers = ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="fetch")
+    labelers = ThreadPoolExecutor(max_workers=label_slots, thread_name_prefix="label")
+    try:
+        for ticker in tickers:
+            fetchers.submit(fetch, ticker)
+
+        while len(summary) < len(tickers):
+            try:
+                ticker, page_rows, result = pages.get(timeout=0.2)
+            except queue.Empty:
+                ticker = None
+            if ticker is not None:
+                if ticker not in open_tickers:
+                    open_tickers[ticker] = new_entry(ticker)
+                entry = open_tickers[ticker]
+                if page_rows:
+                    in_flight.acquire()
+                    seq = len(entry["labels"])
+                    entry["labels"].append(labelers.submit(label, ticker, entry, seq, page_rows))
+                    entry["new"] += len(page_rows)
+                if result is not None:
+                    entry["result"] = result
+
+            # Tickers are written out once their walk is over and every page is labeled.
+            for ticker, entry in list(open_tickers.items()):
+                if entry["result"] is not None and all(future.done() for future in entry["labels"]):
+                    del open_tickers[ticker]
+                    finish(ticker, entry)
+    finally:
+        stopping.set()
+        fetchers.shutdown(wait=True, cancel_futures=True)
+        labelers.shutdown(wait=True, cancel_futures=True)
+        # Keep whatever an interrupted --full scan already wrote.
+        for entry in open_tickers.values():
+            if "writer" in entry:
+                entry["writer"].close()
+
+    summary_df = pd.DataFrame(summary).sort_values("ticker")
+    summary_file = os.path.join(args.output_dir, f"summary_{datetime.now().strftime('%Y%m%d_%H%M')}.csv")
+    summary_df.to_csv(summary_file, index=False, encoding='utf-8-sig')
+    print("-" * 30)
+    reuse = sentiment_engine.default_memo.report()
+    if reuse['messages']:
+        duplicate_rate = reuse['memo_hit_rate'] + reuse['disk_hit_rate'] + reuse['batch_duplicate_rate']
+        print(f"♻️  Inference skipped for {reuse['inference_saved_rate'] * 100:.1f}% of {reuse['messages']} classified messages "
+              f"(cached id {reuse['stream_id_hit_rate'] * 100:.1f}%, duplicate text {duplicate_rate * 100:.1f}%, "
+              f"near-duplicate {reuse['near_duplicate_rate'] * 100:.1f}%)")
+    print(f"✅ SAVED: {summary_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,13 @@
 import os
-import time
-import random
-import requests
-import pandas as pd
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import price_history
+import http_client
+import price_store
+import metrics
 
 load_dotenv()
+metrics.start_run("scrape_prices")
 
 auth_token = os.getenv("TARGET_AUTH_TOKEN")
 if not auth_token:
@@ -35,55 +36,34 @@ headers = {
 print(f"--- STARTING SCRAPER FOR: {ticker_symbol} ---")
 print(f"Target Period: {start_date_obj.strftime('%Y-%m-%d')} to {end_date_obj.strftime('%Y-%m-%d')}")
 
-all_price_data = []
-curr_date = start_date_obj
+print(f"Workers: {price_history.MAX_WORKERS} | Rate limit: {http_client.REQUESTS_PER_SECOND} req/s "
+      f"(burst {http_client.REQUEST_BURST})")
 
 target_url = f"{base_url_env}/{ticker_symbol}"
 
-while curr_date < end_date_obj:
-    batch_end = min(curr_date + timedelta(days=30), end_date_obj)
-    
-    start_str = curr_date.strftime("%Y-%m-%d")
-    end_str = batch_end.strftime("%Y-%m-%d")
-    
-    print(f"Fetching batch: {start_str} to {end_str}...", end=" ")
-    
-    params = {
-        "period": "HS_PERIOD_DAILY",
-        "start_date": start_str,
-        "end_date": end_str,
-        "limit": 50,
-        "page": 1
-    }
-    
-    try:
-        response = requests.get(target_url, headers=headers, params=params)
-        
-        if response.status_code == 200:
-            data_json = response.json()
-            batch_result = data_json.get('data', {}).get('result', [])
-            
-            if batch_result:
-                all_price_data.extend(batch_result)
-                print(f"[OK] Retrieved {len(batch_result)} records.")
-            else:
-                print("[WARNING] Result empty.")
-                
-        else:
-            print(f"[FAILED] Status Code: {response.status_code}")
-            
-    except Exception as e:
-        print(f"[ERROR] Connection failed: {e}")
+def report_window(start, end, status_code, rows, error):
+    label = f"Batch {start.strftime('%Y-%m-%d')} to {end.strftime('%Y-%m-%d')}:"
+    if error is not None:
+        print(f"{label} [ERROR] Connection failed: {error}")
+    elif status_code != 200:
+        print(f"{label} [FAILED] Status Code: {status_code}")
+    elif rows:
+        print(f"{label} [OK] Retrieved {len(rows)} records.")
+    else:
+        print(f"{label} [WARNING] Result empty.")
+
+stored_bars = len(price_store.load_prices(ticker_symbol))
+if stored_bars:
+    print(f"Local store has {stored_bars} bars, fetching only the missing dates.")
 
-    time.sleep(random.uniform(1, 3)) 
-    curr_date = batch_end
+df, _ = price_store.refresh_prices(
+    ticker_symbol, target_url, headers, start_date_obj, end_date_obj, on_window=report_window
+)
 
 print("-" * 30)
 
-if all_price_data:
-    df = pd.DataFrame(all_price_data)
-    
-    if not df.empty and 'date' in df.columns:
+if not df.empty:
+    if 'date' in df.columns:
         df = df.drop_duplicates(subset=['date']).sort_values('date', ascending=False)
     
     csv_filename = f"prices_{ticker_symbol}.csv"
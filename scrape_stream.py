@@ -1,14 +1,16 @@
 import os
-import time
-import random
-import requests
-import pandas as pd
 from datetime import datetime, timedelta
-from dateutil import parser
 from dotenv import load_dotenv
-from transformers import pipeline
+import sentiment_engine
+import sentiment_cache
+import near_duplicates
+import stream_scraper
+import stream_store
+import stream_sync
+import metrics
 
 load_dotenv()
+metrics.start_run("scrape_stream")
 
 auth_token = os.getenv("TARGET_AUTH_TOKEN")
 if not auth_token:
@@ -19,22 +21,34 @@ print("="*40)
 print("   TARGET STREAM SCRAPER + AI (V3.1)   ")
 print("="*40)
 
-model_path = "./finetuned_stock_model" 
+model_path = sentiment_engine.MODEL_PATH
 print(f"Loading AI Model from: {model_path}...")
 
 try:
-    stock_classifier = pipeline("sentiment-analysis", model=model_path, tokenizer=model_path)
+    with metrics.stage("model_load"):
+        stock_classifier = sentiment_engine.load_classifier(model_path)
     print("✅ AI Model Loaded Successfully!")
 except Exception as e:
     print(f"❌ ERROR Loading AI Model: {e}")
     print("Make sure the folder exists and contains the model files.")
     exit()
 
+try:
+    message_cache = sentiment_cache.SentimentCache(model_path=model_path)
+    print(f"🗄️  Sentiment cache: {sentiment_cache.CACHE_PATH}")
+except Exception as e:
+    message_cache = None
+    print(f"⚠️ Sentiment cache disabled: {e}")
+
 print("-" * 30)
 
 ticker_symbol = input("Enter stock ticker (e.g., BBCA): ").strip().upper() or "BBCA"
 days_input = input("Enter number of days to scrape (Default 30): ").strip()
 days_back = int(days_input) if days_input.isdigit() else 30
+incremental_input = input("Resume from previous runs, fetching only new messages? (Y/n): ").strip().lower()
+incremental = incremental_input != "n"
+clusters_input = input("Count near-duplicate spam clusters once in the summary? (y/N): ").strip().lower()
+count_clusters_once = clusters_input == "y"
 
 cutoff_date = datetime.now() - timedelta(days=days_back)
 
@@ -54,153 +68,102 @@ print(f"\n--- STARTING SCRAPER FOR: {ticker_symbol} ---")
 print(f"Target Cutoff Date: {cutoff_date.strftime('%Y-%m-%d')}")
 print("-" * 30)
 
-all_streams = []
-current_cursor = None
-max_loops = 50000 
-is_finished = False
-
-for i in range(max_loops):
-    if is_finished: break
-
-    print(f"Fetching batch {i+1}...", end=" ")
-
-    params = {"category": "STREAM_CATEGORY_ALL", "limit": 20}
-    if current_cursor: params["last_stream_id"] = current_cursor
-
-    try:
-        response = requests.get(base_url, headers=headers, params=params)
-        if response.status_code == 200:
-            data_json = response.json()
-            stream_list = data_json.get('data', {}).get('stream', [])
-            next_cursor = data_json.get('data', {}).get('pagination', {}).get('next_cursor')
-            
-            if not stream_list:
-                print("[STOP] No more messages.")
-                break
-                
-            batch_count = 0
-            last_date_str = ""
-
-            for msg in stream_list:
-                try:
-                    msg_date = parser.parse(msg.get('created_at')).replace(tzinfo=None)
-                except: continue
-
-                if msg_date < cutoff_date:
-                    print(f"\n[STOP] Reached cutoff: {msg_date.strftime('%Y-%m-%d')}")
-                    is_finished = True
-                    break
-
-                content_text = msg.get('content_original', msg.get('content'))
-                
-                sentiment_label = msg.get('news_feed', {}).get('label', 'neutral')
-                if not sentiment_label: sentiment_label = 'neutral' 
-
-                target_price_data = msg.get('target_price', [])
-                prediction_signal = "none"
-                
-                if target_price_data:
-                    tp_info = target_price_data[0] 
-                    last_px = tp_info.get('last_price', 0)
-                    target_px = tp_info.get('target_price', 0)
-                    
-                    if last_px > 0 and target_px > 0:
-                        if target_px > last_px:
-                            prediction_signal = "bullish_target"
-                        elif target_px < last_px:
-                            prediction_signal = "bearish_target"
-
-                ai_sentiment = "NEUTRAL 😐"
-                ai_score = 0.0
-
-                if content_text:
-                    try:
-                        ai_result = stock_classifier(content_text[:512]) 
-                        
-                        raw_label = ai_result[0]['label']
-                        ai_score = ai_result[0]['score']
-                        
-                        threshold_neutral = 0.75
-
-                        if ai_score < threshold_neutral:
-                            ai_sentiment = "NEUTRAL 😐"
-                        elif raw_label == 'LABEL_1':
-                            ai_sentiment = "BULLISH 🚀"
-                        else:
-                            ai_sentiment = "BEARISH 🔻"
-                            
-                    except Exception:
-                        ai_sentiment = "ERROR"
-
-                row = {
-                    "stream_id": msg.get('stream_id'),
-                    "date": msg_date.strftime('%Y-%m-%d %H:%M:%S'),
-                    "username": msg.get('user', {}).get('username'),
-                    "content": content_text, 
-                    "sentiment_label": sentiment_label,       
-                    "prediction_signal": prediction_signal,   
-                    "ai_sentiment": ai_sentiment, 
-                    "ai_confidence": round(ai_score, 4),
-                    "likes": msg.get('total_likes', 0),
-                    "replies": msg.get('total_replies', 0)
-                }
-                all_streams.append(row)
-                batch_count += 1
-                last_date_str = msg_date.strftime('%Y-%m-%d')
-
-            print(f"[OK] +{batch_count} msgs. (Last: {last_date_str})")
-            
-            if next_cursor: current_cursor = next_cursor
-            else: break
-        else:
-            print(f"[FAIL] {response.status_code}")
-            break
-            
-    except Exception as e:
-        print(f"[ERROR] {e}")
-        break
-
-    time.sleep(random.uniform(1.5, 3))
+store = stream_store.StreamStore() if incremental else None
+scan_state = store.get_state(ticker_symbol) if store else None
+if scan_state:
+    print(f"Resuming after message {scan_state['newest_stream_id']} ({scan_state['newest_date']}).")
 
-print("-" * 30)
+csv_filename = f"stream_{ticker_symbol}_{days_back}days_AI_Analytics.csv"
+try:
+    writer = stream_scraper.ChunkedCsvWriter(csv_filename, stream_store.COLUMNS)
+except PermissionError:
+    print(f"\n⛔ ERROR: File '{csv_filename}' currently running. close it first!")
+    exit()
+
+tally = stream_scraper.SentimentTally(
+    near_dupes=near_duplicates.NearDuplicateIndex() if count_clusters_once else None
+)
+# Near-identical messages in this run are classified once, through one representative.
+inference_clusters = near_duplicates.NearDuplicateIndex()
+scan_result = {}
+new_count = 0
+
+# fetch page -> parse -> classify -> persist, one page at a time; the next
+# page is already being fetched while this one is classified (one batched
+# pass per page, skipping messages already cached).
+pages = stream_sync.label_pages(
+    stream_scraper.iter_ticker(base_url, headers, cutoff_date, state=scan_state, result=scan_result),
+    stock_classifier, cache=message_cache, near_dupes=inference_clusters
+)
+for page_number, (page_rows, stop_reason) in enumerate(pages):
+    if store:
+        store.save_messages(ticker_symbol, page_rows)
+    else:
+        writer.write(page_rows)
+        tally.add(page_rows)
+    new_count += len(page_rows)
+
+    last_date_str = page_rows[-1]['date'][:10] if page_rows else ""
+    print(f"Batch {page_number+1}: [OK] +{len(page_rows)} msgs. (Last: {last_date_str})")
+
+    if stop_reason == "cutoff":
+        print("[STOP] Reached cutoff.")
+    elif stop_reason == "known":
+        print("[STOP] Reached messages from the previous run.")
+
+outcome = scan_result["outcome"]
+if scan_result["malformed"]:
+    print(f"[WARNING] Skipped {scan_result['malformed']} malformed messages.")
+if outcome["reason"] == "end":
+    print("[STOP] No more messages.")
+elif outcome["error"] is not None:
+    print(f"[ERROR] {outcome['error']}")
+elif outcome["reason"] == "error":
+    print(f"[FAIL] {outcome['status_code']}")
+
+if store:
+    if scan_result["state"]:
+        store.set_state(ticker_symbol, scan_result["state"])
+    for chunk in store.iter_messages(ticker_symbol, since=cutoff_date):
+        writer.write(chunk)
+        tally.add(chunk)
+    print(f"Merged {new_count} new messages into history ({tally.messages} in window).")
+
+writer.close()
 
-if all_streams:
-    df = pd.DataFrame(all_streams)
-    csv_filename = f"stream_{ticker_symbol}_{days_back}days_AI_Analytics.csv"
-    
-    total_msgs = len(df)
-    
-    bullish_count = len(df[df['ai_sentiment'] == 'BULLISH 🚀'])
-    bearish_count = len(df[df['ai_sentiment'] == 'BEARISH 🔻'])
-    neutral_count = len(df[df['ai_sentiment'] == 'NEUTRAL 😐'])
-    
-    bullish_pct = (bullish_count / total_msgs) * 100 if total_msgs > 0 else 0
-    bearish_pct = (bearish_count / total_msgs) * 100 if total_msgs > 0 else 0
-    neutral_pct = (neutral_count / total_msgs) * 100 if total_msgs > 0 else 0
+print("-" * 30)
 
+if tally.total:
+    stats = tally.summary()
     sentiment_map = {
-        "BULLISH 🚀": bullish_pct,
-        "BEARISH 🔻": bearish_pct,
-        "NEUTRAL 😐": neutral_pct
+        "BULLISH 🚀": stats['bullish_pct'],
+        "BEARISH 🔻": stats['bearish_pct'],
+        "NEUTRAL 😐": stats['neutral_pct']
     }
-    dominant_sentiment = max(sentiment_map, key=sentiment_map.get)
+    dominant_sentiment = stats['dominant']
     dominant_pct = sentiment_map[dominant_sentiment]
 
-    print(f"\n📊 Quick Analysis for {len(df)} messages:")
+    if count_clusters_once:
+        print(f"\n📊 Quick Analysis for {stats['messages']} messages ({stats['total']} after collapsing near-duplicates):")
+    else:
+        print(f"\n📊 Quick Analysis for {stats['total']} messages:")
     print(f"- Platform Signals (Target Price):")
-    print(f"  > Bullish: {len(df[df['prediction_signal']=='bullish_target'])}")
-    print(f"  > Bearish: {len(df[df['prediction_signal']=='bearish_target'])}")
+    print(f"  > Bullish: {stats['bullish_target']}")
+    print(f"  > Bearish: {stats['bearish_target']}")
     print(f"- AI Sentiment Analysis:")
-    print(f"  > Bullish : {bullish_count} ({bullish_pct:.1f}%)")
-    print(f"  > Bearish : {bearish_count} ({bearish_pct:.1f}%)")
-    print(f"  > Neutral : {neutral_count} ({neutral_pct:.1f}%)")
+    print(f"  > Bullish : {stats['bullish']} ({stats['bullish_pct']:.1f}%)")
+    print(f"  > Bearish : {stats['bearish']} ({stats['bearish_pct']:.1f}%)")
+    print(f"  > Neutral : {stats['neutral']} ({stats['neutral_pct']:.1f}%)")
     print("-" * 30)
     print(f"📢 CONCLUSION: Market Sentiment is {dominant_sentiment} ({dominant_pct:.1f}%)")
-    
-    try:
-        df.to_csv(csv_filename, index=False, encoding='utf-8-sig')
-        print(f"\n✅ SAVED: {csv_filename}")
-    except PermissionError:
-        print(f"\n⛔ ERROR: File '{csv_filename}' currently running. close it first!")
+
+    reuse = sentiment_engine.default_memo.report()
+    if reuse['messages']:
+        duplicate_rate = reuse['memo_hit_rate'] + reuse['disk_hit_rate'] + reuse['batch_duplicate_rate']
+        print(f"♻️  Inference skipped for {reuse['inference_saved_rate'] * 100:.1f}% of {reuse['messages']} classified messages "
+              f"(cached id {reuse['stream_id_hit_rate'] * 100:.1f}%, duplicate text {duplicate_rate * 100:.1f}%, "
+              f"near-duplicate {reuse['near_duplicate_rate'] * 100:.1f}%)")
+    print(f"\n✅ SAVED: {csv_filename}")
 else:
-    print("❌ No data retrieved.")
\ No newline at end of file
+    os.remove(csv_filename)
+    print("❌ No data retrieved.")
@@ -0,0 +1,164 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+import metrics
+import sentiment_engine
+
+CACHE_PATH = os.path.join("data", "sentiment_cache.db")
+MAX_ENTRIES = 500000
+
+_fingerprint_memo = {}
+
+
+def model_fingerprint(model_path=sentiment_engine.MODEL_PATH):
+    """
+    Returns a short content hash of every file in the model folder.
+    The hash is memoized per (path, size, mtime) listing, so repeated calls
+    in the same process do not re-read the weights.
+    """
+    if not os.path.isdir(model_path):
+        return hashlib.blake2b(model_path.encode(), digest_size=16).hexdigest()
+
+    files = []
+    for root, _, names in os.walk(model_path):
+        for name in sorted(names):
+            full = os.path.join(root, name)
+            st = os.stat(full)
+            files.append((os.path.relpath(full, model_path), st.st_size, st.st_mtime_ns))
+    files.sort()
+
+    listing = (model_path, tuple(files))
+    if listing in _fingerprint_memo:
+        return _fingerprint_memo[listing]
+
+    digest = hashlib.blake2b(digest_size=16)
+    for rel, _, _ in files:
+        digest.update(rel.encode())
+        with open(os.path.join(model_path, rel), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+
+    _fingerprint_memo[listing] = digest.hexdigest()
+    return _fingerprint_memo[listing]
+
+
+class SentimentCache:
+    """
+    On-disk cache of classified stream messages.
+
+    Rows are keyed by (stream_id, model fingerprint), where the fingerprint
+    covers the weights and the inference backend. Rows written with other
+    weights are dropped on open; rows from other backends on the same
+    weights are kept, since processes with different SENTIMENT_BACKEND
+    values share the file. The table is trimmed to `max_entries` by
+    evicting the oldest inserts.
+    """
+
+    def __init__(self, db_path=CACHE_PATH, model_path=sentiment_engine.MODEL_PATH, max_entries=MAX_ENTRIES,
+                 backend=sentiment_engine.BACKEND):
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        weights = f"{model_fingerprint(model_path)}:"
+        self.fingerprint = f"{weights}{backend}"
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS message_sentiment (
+                stream_id TEXT NOT NULL,
+                model_fp TEXT NOT NULL,
+                label TEXT,
+                score REAL,
+                sentiment TEXT,
+                cached_at REAL,
+                PRIMARY KEY (stream_id, model_fp)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_message_sentiment_age ON message_sentiment (cached_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS text_sentiment (
+                text_hash TEXT NOT NULL,
+                model_fp TEXT NOT NULL,
+                label TEXT,
+                score REAL,
+                sentiment TEXT,
+                cached_at REAL,
+                PRIMARY KEY (text_hash, model_fp)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_text_sentiment_age ON text_sentiment (cached_at)")
+        for table in ("message_sentiment", "text_sentiment"):
+            self._conn.execute(f"DELETE FROM {table} WHERE substr(model_fp, 1, ?) != ?", (len(weights), weights))
+        self._conn.commit()
+
+    def _get(self, table, key_column, keys):
+        keys = [str(k) for k in keys if k is not None]
+        found = {}
+        with self._lock, metrics.stage("cache_read"):
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT {key_column}, label, score, sentiment FROM {table} "
+                    f"WHERE model_fp = ? AND {key_column} IN ({marks})",
+                    [self.fingerprint] + chunk
+                ).fetchall()
+                for key, label, score, sentiment in rows:
+                    found[key] = {"label": label, "score": score, "sentiment": sentiment}
+        return found
+
+    def _put(self, table, items):
+        now = time.time()
+        rows = [
+            (str(key), self.fingerprint, res['label'], res['score'], res['sentiment'], now)
+            for key, res in items if key is not None and res is not None
+        ]
+        if not rows:
+            return
+
+        with self._lock, metrics.stage("cache_write"):
+            self._conn.executemany(f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?, ?, ?)", rows)
+            total = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            if total > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE rowid IN "
+                    f"(SELECT rowid FROM {table} ORDER BY cached_at LIMIT ?)",
+                    (total - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def get_many(self, stream_ids):
+        """
+        Returns {stream_id: {"label", "score", "sentiment"}} for the ids
+        already classified by the current model.
+        """
+        return self._get("message_sentiment", "stream_id", stream_ids)
+
+    def put_many(self, items):
+        """
+        Stores (stream_id, result) pairs and evicts the oldest rows
+        if the cache grew past its limit.
+        """
+        self._put("message_sentiment", items)
+
+    def get_texts(self, text_hashes):
+        """
+        Same as get_many, keyed by normalized-text hash (see sentiment_engine.text_key).
+        """
+        return self._get("text_sentiment", "text_hash", text_hashes)
+
+    def put_texts(self, items):
+        """
+        Stores (text_hash, result) pairs, with the same size limit as messages.
+        """
+        self._put("text_sentiment", items)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
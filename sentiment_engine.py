@@ -0,0 +1,406 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = "./finetuned_stock_model"
+
+# pytorch: full-precision baseline; quantized: int8 dynamic quantization of
+# the Linear layers; onnx: ONNX Runtime export (needs optimum[onnxruntime]).
+BACKENDS = ("pytorch", "quantized", "onnx")
+BACKEND = os.getenv("SENTIMENT_BACKEND", "pytorch")
+
+MEMO_SIZE = 50000
+
+NEUTRAL_THRESHOLD = 0.75
+MAX_TOKENS = 512
+BATCH_SIZE = 32
+
+BULLISH = "BULLISH 🚀"
+BEARISH = "BEARISH 🔻"
+NEUTRAL = "NEUTRAL 😐"
+
+
+def onnx_export_dir(model_path):
+    return model_path.rstrip("/\\") + "_onnx"
+
+
+def _latest_mtime(folder):
+    latest = 0.0
+    for root, _, names in os.walk(folder):
+        for name in names:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
+
+
+def _load_onnx_classifier(model_path):
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        from optimum.pipelines import pipeline as ort_pipeline
+    except ImportError as e:
+        raise ImportError("The onnx backend needs: pip install optimum[onnxruntime]") from e
+    from transformers import AutoTokenizer
+
+    export_dir = onnx_export_dir(model_path)
+    # Re-export whenever the finetuned weights are newer than the export.
+    if os.path.isdir(export_dir) and _latest_mtime(export_dir) >= _latest_mtime(model_path):
+        model = ORTModelForSequenceClassification.from_pretrained(export_dir)
+    else:
+        logger.info("Exporting %s to ONNX at %s", model_path, export_dir)
+        model = ORTModelForSequenceClassification.from_pretrained(model_path, export=True)
+        model.save_pretrained(export_dir)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    return ort_pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, accelerator="ort")
+
+
+def load_classifier(model_path=MODEL_PATH, backend=BACKEND):
+    """
+    Loads the finetuned sentiment pipeline on the chosen backend.
+    Every backend returns the same pipeline interface and raw labels.
+    Raises if the model folder is missing or broken.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend {backend!r}, expected one of {BACKENDS}")
+
+    if backend == "onnx":
+        return _load_onnx_classifier(model_path)
+
+    from transformers import pipeline
+
+    if backend == "quantized":
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+    return pipeline("sentiment-analysis", model=model_path, tokenizer=model_path)
+
+
+class ClassifierWarmup:
+    """
+    Loads the classifier on a background thread so callers (e.g. the
+    dashboard) can keep working while torch/transformers import.
+    `ready` is set once loading finished, successfully or not; on failure
+    `classifier` stays None and `error` holds the exception.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, backend=BACKEND):
+        self.model_path = model_path
+        self.backend = backend
+        self.classifier = None
+        self.error = None
+        self.timings = {}
+        self.ready = threading.Event()
+        threading.Thread(target=self._load, name="classifier-warmup", daemon=True).start()
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            import transformers  # noqa: F401  (timed on its own, it dominates cold starts)
+            self.timings["import_seconds"] = time.perf_counter() - start
+            logger.info("Imported transformers in %.2fs", self.timings["import_seconds"])
+
+            loaded_at = time.perf_counter()
+            self.classifier = load_classifier(self.model_path, backend=self.backend)
+            self.timings["load_seconds"] = time.perf_counter() - loaded_at
+            logger.info("Loaded %s model from %s in %.2fs", self.backend, self.model_path, self.timings["load_seconds"])
+        except Exception as e:
+            self.error = e
+            logger.exception("Model warm-up failed")
+        finally:
+            self.timings["total_seconds"] = time.perf_counter() - start
+            self.ready.set()
+
+    def is_ready(self):
+        return self.ready.is_set()
+
+
+def to_sentiment(raw_label, score):
+    """
+    Maps a raw model output to BULLISH / BEARISH / NEUTRAL.
+    Anything below the confidence threshold counts as NEUTRAL.
+    """
+    if score < NEUTRAL_THRESHOLD:
+        return NEUTRAL
+    elif raw_label == 'LABEL_1':
+        return BULLISH
+    return BEARISH
+
+
+def _token_lengths(classifier, texts):
+    encoded = classifier.tokenizer(texts, truncation=True, max_length=MAX_TOKENS)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def _run_batch(classifier, texts):
+    try:
+        return classifier(texts, batch_size=len(texts), truncation=True, max_length=MAX_TOKENS)
+    except Exception:
+        # One bad text should not sink the whole batch, retry one by one.
+        outputs = []
+        for text in texts:
+            try:
+                outputs.append(classifier(text, truncation=True, max_length=MAX_TOKENS)[0])
+            except Exception:
+                outputs.append(None)
+        return outputs
+
+
+# HF pipelines (and fast tokenizers) are not safe to call from several
+# threads at once; concurrent callers take turns on the model.
+_inference_lock = threading.Lock()
+
+
+def classify_texts(classifier, texts, batch_size=BATCH_SIZE):
+    """
+    Classifies a list of texts (a page, or several pages, of messages).
+
+    Texts are sorted by token length so every batch carries little padding,
+    and are truncated to MAX_TOKENS tokens by the tokenizer.
+    Returns one dict per input, in input order:
+        {"label": raw_label, "score": score, "sentiment": BULLISH/BEARISH/NEUTRAL}
+    or None when the text could not be classified.
+    """
+    # An inference_pool.InferencePool shards the work over its own processes.
+    sharded = getattr(classifier, "classify_texts", None)
+    if sharded is not None:
+        return sharded(texts, batch_size=batch_size)
+
+    results = [None] * len(texts)
+    if not texts:
+        return results
+
+    with _inference_lock:
+        lengths = _token_lengths(classifier, texts)
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            outputs = _run_batch(classifier, [texts[i] for i in batch_idx])
+
+            for i, out in zip(batch_idx, outputs):
+                if out is None:
+                    continue
+                results[i] = {
+                    "label": out['label'],
+                    "score": out['score'],
+                    "sentiment": to_sentiment(out['label'], out['score'])
+                }
+
+    return results
+
+
+_WHITESPACE = re.compile(r"\s+")
+# Cashtags ($BBCA) and the platform's masked ticker placeholders ([BBCA], [ticker]).
+_TICKER_TOKEN = re.compile(r"\$[A-Za-z]{4}\b|\[[A-Za-z0-9_ ]+\]")
+
+
+def normalize_text(text):
+    """
+    Normalizes a message for duplicate detection: tickers masked,
+    lowercased, whitespace collapsed.
+    """
+    text = _TICKER_TOKEN.sub("$ticker", text)
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def text_key(text):
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class TextMemo:
+    """
+    In-process LRU of classification results keyed by normalized-text hash,
+    so copy-pasted messages and reposts are classified once.
+    Also keeps the hit counters reported at the end of a run.
+    """
+
+    def __init__(self, max_entries=MEMO_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "messages": 0,
+            "stream_id_hits": 0,
+            "memo_hits": 0,
+            "disk_hits": 0,
+            "batch_duplicates": 0,
+            "near_duplicates": 0,
+            "classified": 0
+        }
+
+    def get(self, key):
+        with self._lock:
+            res = self._entries.get(key)
+            if res is not None:
+                self._entries.move_to_end(key)
+            return res
+
+    def put(self, key, res):
+        with self._lock:
+            self._entries[key] = res
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def report(self):
+        """
+        Returns the counters plus hit rates as fractions of all messages seen.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        total = stats["messages"]
+        for name in ("stream_id_hits", "memo_hits", "disk_hits", "batch_duplicates", "near_duplicates"):
+            stats[name.replace("hits", "hit_rate").replace("duplicates", "duplicate_rate")] = (
+                stats[name] / total if total else 0.0
+            )
+        stats["inference_saved_rate"] = 1 - stats["classified"] / total if total else 0.0
+        return stats
+
+
+default_memo = TextMemo()
+
+
+def classify_messages(classifier, items, cache=None, memo=default_memo, batch_size=BATCH_SIZE, near_dupes=None):
+    """
+    Classifies (stream_id, text) pairs, running the model as little as possible.
+
+    Lookups go: stream_id in the SentimentCache, then the normalized-text
+    hash in the in-process memo, then in the cache's on-disk text table.
+    Whatever is left is deduplicated by text hash, so each unique text
+    reaches the model once; fresh results are written back everywhere.
+    With a near_duplicates.NearDuplicateIndex as `near_dupes`, only one
+    representative per near-duplicate cluster is classified and the rest
+    of the cluster takes its result (not written to the text caches).
+    Returns one result (or None) per item, in input order.
+    """
+    results = [None] * len(items)
+    if memo:
+        memo.count("messages", len(items))
+    cached = cache.get_many([stream_id for stream_id, _ in items]) if cache else {}
+
+    keys = {}
+    pending = []
+    for i, (stream_id, text) in enumerate(items):
+        hit = cached.get(str(stream_id)) if stream_id is not None else None
+        if hit:
+            results[i] = hit
+            if memo:
+                memo.count("stream_id_hits")
+            continue
+
+        key = (id(classifier), text_key(text))
+        keys[i] = key
+        hit = memo.get(key) if memo else None
+        if hit:
+            results[i] = hit
+            memo.count("memo_hits")
+        else:
+            pending.append(i)
+
+    if pending and cache:
+        on_disk = cache.get_texts([keys[i][1] for i in pending])
+        still_pending = []
+        for i in pending:
+            hit = on_disk.get(keys[i][1])
+            if hit:
+                results[i] = hit
+                if memo:
+                    memo.put(keys[i], hit)
+                    memo.count("disk_hits")
+            else:
+                still_pending.append(i)
+        pending = still_pending
+
+    if pending and classifier:
+        to_model = pending
+        if near_dupes is not None:
+            clusters = dict(zip(pending, near_dupes.assign([items[i][1] for i in pending])))
+            representatives = {}
+            for i in pending:
+                representatives.setdefault(clusters[i], i)
+            to_model = [i for c, i in representatives.items() if c not in near_dupes.results]
+
+        unique = {}
+        for i in to_model:
+            unique.setdefault(keys[i], i)
+        if memo:
+            memo.count("batch_duplicates", len(to_model) - len(unique))
+            memo.count("classified", len(unique))
+
+        with metrics.stage("inference"):
+            fresh = classify_texts(classifier, [items[i][1] for i in unique.values()], batch_size=batch_size)
+        metrics.inc("messages_classified_total", len(unique))
+        by_key = dict(zip(unique.keys(), fresh))
+        for i in to_model:
+            results[i] = by_key[keys[i]]
+
+        if near_dupes is not None:
+            for i in to_model:
+                if results[i] is not None:
+                    near_dupes.results.setdefault(clusters[i], results[i])
+            collapsed = 0
+            for i in pending:
+                if results[i] is None and clusters[i] in near_dupes.results:
+                    results[i] = near_dupes.results[clusters[i]]
+                    collapsed += 1
+            if memo:
+                memo.count("near_duplicates", collapsed)
+
+        if memo:
+            for key, res in by_key.items():
+                if res is not None:
+                    memo.put(key, res)
+        if cache:
+            cache.put_texts([(key[1], res) for key, res in by_key.items()])
+
+    if cache:
+        cache.put_many([
+            (items[i][0], results[i]) for i in keys if results[i] is not None
+        ])
+
+    return results
+
+
+def label_rows(classifier, rows, cache=None, memo=default_memo, batch_size=BATCH_SIZE, near_dupes=None):
+    """
+    Fills 'ai_sentiment' and 'ai_confidence' on stream rows in place.
+    Rows without content are NEUTRAL with 0.0 confidence; rows the model
+    could not classify are marked ERROR.
+    """
+    to_classify = []
+    for row in rows:
+        if row['content']:
+            to_classify.append(row)
+        else:
+            row['ai_sentiment'] = NEUTRAL
+            row['ai_confidence'] = 0.0
+
+    results = classify_messages(
+        classifier,
+        [(row['stream_id'], row['content']) for row in to_classify],
+        cache=cache,
+        memo=memo,
+        batch_size=batch_size,
+        near_dupes=near_dupes
+    )
+    for row, res in zip(to_classify, results):
+        if res is None:
+            row['ai_sentiment'] = "ERROR"
+        else:
+            row['ai_sentiment'] = res['sentiment']
+            row['ai_confidence'] = round(res['score'], 4)
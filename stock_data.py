@@ -1,104 +1,169 @@
+import os
+import csv
 import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# CSV with ticker,sector,subsector columns; point it at a full IDX export
+# to recommend across the whole exchange.
+UNIVERSE_FILE = os.getenv("SECTOR_UNIVERSE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              "sector_universe.csv"))
+
+
+class SectorUniverse:
+    """
+    Immutable snapshot of the ticker universe with its lookup indexes:
+    ticker -> sector, ticker -> subsector, and sector -> tickers.
+    `tickers` is grouped by sector and `spans[sector]` is that sector's
+    (start, end) slice of it, so "any ticker outside a sector" is two
+    contiguous ranges.
+    """
+
+    def __init__(self, rows, path=None, mtime=None):
+        self.path = path
+        self.mtime = mtime
+        self.sectors = {}
+        self.subsectors = {}
+        self.by_sector = {}
+        for ticker, sector, subsector in rows:
+            self.sectors[ticker] = sector
+            self.subsectors[ticker] = subsector
+        for ticker, sector in self.sectors.items():
+            self.by_sector.setdefault(sector, []).append(ticker)
+
+        self.tickers = []
+        self.spans = {}
+        for sector, members in self.by_sector.items():
+            self.spans[sector] = (len(self.tickers), len(self.tickers) + len(members))
+            self.tickers.extend(members)
+
+
+def read_universe(path):
+    """
+    Reads a universe file into a SectorUniverse. Blank tickers are
+    skipped; later rows win over earlier duplicates.
+    """
+    rows = []
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        for record in csv.DictReader(f):
+            ticker = (record.get("ticker") or "").strip().upper()
+            if not ticker:
+                continue
+            sector = (record.get("sector") or "").strip() or "Unknown"
+            subsector = (record.get("subsector") or "").strip() or "Unknown"
+            rows.append((ticker, sector, subsector))
+    return SectorUniverse(rows, path=path, mtime=os.path.getmtime(path))
+
+
+# What a half-written or mis-encoded universe file raises while being parsed.
+PARSE_ERRORS = (csv.Error, UnicodeDecodeError)
+
+_universe = SectorUniverse([])
+_reload_lock = threading.Lock()
+# mtime of the last file that failed to load, so it is not re-read every rerun.
+_failed_mtime = None
+SECTOR_DATABASE = _universe.sectors
+
+
+def reload_universe(path=None):
+    """
+    (Re)loads the universe from `path` (default UNIVERSE_FILE) and swaps it
+    in at once, so concurrent lookups see either the old or the new list.
+    Returns the number of tickers loaded.
+    """
+    global _universe, SECTOR_DATABASE
+    path = path or UNIVERSE_FILE
+    with _reload_lock:
+        universe = read_universe(path)
+        _universe = universe
+        SECTOR_DATABASE = universe.sectors
+    return len(universe.tickers)
+
+
+def reload_if_changed():
+    """
+    Reloads the universe file if it was modified since it was loaded.
+    Cheap enough (one stat call) to run on every dashboard rerun.
+    A file that cannot be read or parsed is logged and the current
+    universe is kept. Returns True if it reloaded.
+    """
+    global _failed_mtime
+    path = _universe.path or UNIVERSE_FILE
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return False
+    if mtime == _universe.mtime or mtime == _failed_mtime:
+        return False
+    try:
+        reload_universe(path)
+    except (OSError, *PARSE_ERRORS) as e:
+        _failed_mtime = mtime
+        logger.warning("Sector universe %s not reloaded (%s); keeping %d tickers.", path, e, len(_universe.tickers))
+        return False
+    return True
+
+
+try:
+    reload_universe()
+except (OSError, *PARSE_ERRORS) as e:
+    logger.warning("Sector universe not loaded (%s); every ticker is 'Unknown'.", e)
 
-SECTOR_DATABASE = {
-    "BBCA": "Finance",
-    "BBRI": "Finance",
-    "BMRI": "Finance",
-    "BBNI": "Finance",
-    "BBTN": "Finance",  
-    "BRIS": "Finance",  
-    "ARTO": "Finance",  
-    "BNGA": "Finance",
-    "NISP": "Finance",
-    "MEGA": "Finance",
-
-    "ADRO": "Energy",
-    "PTBA": "Energy",
-    "ITMG": "Energy",
-    "BUMI": "Energy",   
-    "HRUM": "Energy",
-    "INDY": "Energy",
-    "PGAS": "Energy",
-    "MEDC": "Energy",
-    "AKRA": "Energy",
-
-    "MDKA": "Basic Materials",
-    "ANTM": "Basic Materials",
-    "INCO": "Basic Materials",
-    "MBMA": "Basic Materials",
-    "TINS": "Basic Materials",
-    "BRMS": "Basic Materials",
-    "SMGR": "Basic Materials",
-    "INTP": "Basic Materials",
-    "TPIA": "Basic Materials",
-    "BRPT": "Basic Materials",
-
-    "TLKM": "Infrastructure",
-    "ISAT": "Infrastructure",
-    "EXCL": "Infrastructure",
-    "TOWR": "Infrastructure",
-    "MTEL": "Infrastructure",
-    "JSMR": "Infrastructure",
-    "PTPP": "Infrastructure",
-    "WIKA": "Infrastructure",
-
-    "ICBP": "Consumer Non-Cyclicals",
-    "INDF": "Consumer Non-Cyclicals",
-    "MYOR": "Consumer Non-Cyclicals",
-    "CMRY": "Consumer Non-Cyclicals",
-    "AMRT": "Consumer Non-Cyclicals",
-    "UNVR": "Consumer Non-Cyclicals",
-    "GGRM": "Consumer Non-Cyclicals",
-    "HMSP": "Consumer Non-Cyclicals",
-    "CPIN": "Consumer Non-Cyclicals",
-    "JPFA": "Consumer Non-Cyclicals",
-
-    "GOTO": "Technology",
-    "BUKA": "Technology",
-    "EMTK": "Technology",
-    "WIRG": "Technology",
-
-    "ASII": "Industrials",
-    "UNTR": "Industrials",
-    "HEXA": "Industrials",
-
-    "BSDE": "Property & Real Estate",
-    "CTRA": "Property & Real Estate",
-    "PWON": "Property & Real Estate",
-    "SMRA": "Property & Real Estate",
-    "PANI": "Property & Real Estate",
-
-    "KLBF": "Healthcare",
-    "MIKA": "Healthcare",
-    "SILO": "Healthcare",
-    "HEAL": "Healthcare",
-}
 
 def get_ticker_sector(ticker):
     """
     Returns the sector name for a given ticker.
     Returns 'Unknown' if not found in DB.
     """
-    return SECTOR_DATABASE.get(ticker.upper(), "Unknown")
+    return _universe.sectors.get(ticker.upper(), "Unknown")
+
 
-def get_diversification_candidates(current_sector, existing_watchlist=[]):
+def get_ticker_subsector(ticker):
+    """
+    Returns the subsector name for a given ticker, or 'Unknown'.
     """
-    Returns a list of 3 random stock recommendations.
-    
+    return _universe.subsectors.get(ticker.upper(), "Unknown")
+
+
+def get_sector_tickers(sector):
+    """
+    Returns the tickers of one sector (empty list if unknown).
+    """
+    return list(_universe.by_sector.get(sector, []))
+
+
+def get_diversification_candidates(current_sector, existing_watchlist=None, count=3):
+    """
+    Returns a list of `count` (default 3) random stock recommendations.
+
     Logic:
     1. Must be from a DIFFERENT sector than 'current_sector'.
     2. Must NOT be in 'existing_watchlist' (already owned).
+
+    Samples positions outside the sector's span of the sector-grouped
+    ticker list and skips excluded ones, so the cost grows with `count` and
+    the watchlist, not with the size of the universe. Falls back to a full
+    scan when most of the other sectors are on the watchlist.
     """
-    candidates = []
-    
-    clean_watchlist = [t.upper() for t in existing_watchlist]
-
-    for ticker, sector in SECTOR_DATABASE.items():
-        if sector != current_sector:
-            if ticker not in clean_watchlist:
-                candidates.append(ticker)
-    
-    if len(candidates) >= 3:
-        return random.sample(candidates, 3)
-    
-    return candidates
\ No newline at end of file
+    universe = _universe
+    excluded = {t.upper() for t in existing_watchlist or ()}
+    start, end = universe.spans.get(current_sector, (0, 0))
+    others = len(universe.tickers) - (end - start)
+
+    picked = []
+    for _ in range(count * 20):
+        if len(picked) == count or others <= 0:
+            break
+        idx = random.randrange(others)
+        if idx >= start:
+            idx += end - start
+        ticker = universe.tickers[idx]
+        if ticker not in excluded and ticker not in picked:
+            picked.append(ticker)
+
+    if len(picked) < count:
+        candidates = [t for t in universe.tickers[:start] + universe.tickers[end:] if t not in excluded]
+        return random.sample(candidates, min(count, len(candidates)))
+    return picked
@@ -0,0 +1,95 @@
+from datetime import datetime
+from dateutil import parser as dateutil_parser
+
+try:
+    import orjson
+
+    def decode_json(raw):
+        return orjson.loads(raw)
+except ImportError:
+    import json
+
+    def decode_json(raw):
+        return json.loads(raw)
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_timestamp(value):
+    """
+    Parses a created_at value into a naive datetime (timezone dropped, as before).
+    ISO-8601 goes through datetime.fromisoformat; dateutil is only the
+    fallback for odd formats. Returns None if neither can read it.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except ValueError:
+        pass
+    try:
+        return dateutil_parser.parse(value).replace(tzinfo=None)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _prediction_signal(target_price_data):
+    if not target_price_data or not isinstance(target_price_data, list):
+        return "none"
+    tp_info = target_price_data[0]
+    if not isinstance(tp_info, dict):
+        return "none"
+
+    last_px = tp_info.get('last_price') or 0
+    target_px = tp_info.get('target_price') or 0
+    try:
+        if last_px > 0 and target_px > 0:
+            if target_px > last_px:
+                return "bullish_target"
+            elif target_px < last_px:
+                return "bearish_target"
+    except TypeError:
+        pass
+    return "none"
+
+
+def parse_page(messages):
+    """
+    Parses a whole page of raw stream messages column by column.
+
+    Returns (dates, rows, malformed): `dates` and `rows` line up with the
+    input, with None in both where a message was malformed (not an object,
+    or no readable created_at); `malformed` counts those.
+    The AI columns are left empty for the classification stage.
+    """
+    msgs = [m if isinstance(m, dict) else None for m in messages]
+    dates = [parse_timestamp(m.get('created_at')) if m else None for m in msgs]
+
+    stream_ids = [m.get('stream_id') if m else None for m in msgs]
+    contents = [m.get('content_original', m.get('content')) if m else None for m in msgs]
+    usernames = [(m.get('user') or {}).get('username') if m else None for m in msgs]
+    labels = [(m.get('news_feed') or {}).get('label') or 'neutral' if m else None for m in msgs]
+    signals = [_prediction_signal(m.get('target_price')) if m else None for m in msgs]
+    likes = [m.get('total_likes', 0) if m else None for m in msgs]
+    replies = [m.get('total_replies', 0) if m else None for m in msgs]
+
+    rows = []
+    malformed = 0
+    for i, msg_date in enumerate(dates):
+        if msg_date is None:
+            malformed += 1
+            rows.append(None)
+            continue
+        rows.append({
+            "stream_id": stream_ids[i],
+            "date": msg_date.strftime(DATE_FORMAT),
+            "username": usernames[i],
+            "content": contents[i],
+            "sentiment_label": labels[i],
+            "prediction_signal": signals[i],
+            "ai_sentiment": None,
+            "ai_confidence": 0.0,
+            "likes": likes[i],
+            "replies": replies[i]
+        })
+    return dates, rows, malformed
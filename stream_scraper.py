@@ -0,0 +1,392 @@
+import csv
+import queue
+import threading
+from datetime import datetime
+import http_client
+import metrics
+import stream_parser
+from stream_parser import DATE_FORMAT
+
+PAGE_LIMIT = 20
+PREFETCH_PAGES = 2
+
+
+def fetch_page(target_url, headers, cursor=None):
+    """
+    Fetches one page of the stream, newest first.
+    Returns (status_code, messages, next_cursor).
+    """
+    params = {"category": "STREAM_CATEGORY_ALL", "limit": PAGE_LIMIT}
+    if cursor:
+        params["last_stream_id"] = cursor
+
+    response = http_client.get(target_url, headers=headers, params=params)
+    if response.status_code != 200:
+        return response.status_code, [], None
+
+    with metrics.stage("decode_json"):
+        data = stream_parser.decode_json(response.content).get('data', {})
+    return 200, data.get('stream', []), data.get('pagination', {}).get('next_cursor')
+
+
+def iter_stream(target_url, headers, cutoff_date, start_cursor=None, stop_at_stream_id=None,
+                stop_before_date=None, max_loops=50000, outcome=None):
+    """
+    Pages backwards from `start_cursor` (None = newest page), yielding
+    (page_rows, stop_reason) one page at a time so callers never hold
+    more than a page in memory.
+
+    Stops at the first message older than `cutoff_date` ("cutoff"), at
+    `stop_at_stream_id` or anything older than `stop_before_date` ("known"),
+    at the end of the stream ("end"), after `max_loops` pages, or on a
+    failed request ("error").
+    `outcome` (a dict) is filled in as the walk goes; outcome["tail_cursor"]
+    is the cursor of the last page processed, so a later walk can resume from it,
+    and outcome["malformed"] counts messages that could not be parsed.
+    """
+    if outcome is None:
+        outcome = {}
+    outcome.update(reason="max_loops", tail_cursor=start_cursor, status_code=None, error=None, pages=0, malformed=0)
+    cursor = start_cursor
+
+    for i in range(max_loops):
+        try:
+            status_code, stream_list, next_cursor = fetch_page(target_url, headers, cursor)
+        except Exception as e:
+            outcome.update(reason="error", error=e)
+            return
+
+        outcome["status_code"] = status_code
+        if status_code != 200:
+            outcome["reason"] = "error"
+            return
+
+        outcome["pages"] = i + 1
+        if not stream_list:
+            outcome["reason"] = "end"
+            return
+
+        with metrics.stage("parse"):
+            dates, parsed_rows, malformed = stream_parser.parse_page(stream_list)
+        metrics.inc("messages_parsed_total", len(stream_list))
+        if malformed:
+            metrics.inc("messages_malformed_total", malformed)
+        outcome["malformed"] += malformed
+
+        page_rows = []
+        stop_reason = None
+        for msg_date, row in zip(dates, parsed_rows):
+            if row is None: continue
+
+            if msg_date < cutoff_date:
+                stop_reason = "cutoff"
+                break
+            if stop_at_stream_id is not None and str(row['stream_id']) == str(stop_at_stream_id):
+                stop_reason = "known"
+                break
+            if stop_before_date is not None and msg_date < stop_before_date:
+                stop_reason = "known"
+                break
+            page_rows.append(row)
+
+        outcome["tail_cursor"] = cursor
+        if stop_reason:
+            outcome["reason"] = stop_reason
+        elif not next_cursor:
+            outcome["reason"] = "end"
+
+        yield page_rows, stop_reason
+
+        if stop_reason or not next_cursor:
+            return
+        cursor = next_cursor
+
+
+def poll_head(target_url, headers, newest_stream_id, newest_date):
+    """
+    One request: the newest page, cut at the message `newest_stream_id`
+    (posted at `newest_date`, a DATE_FORMAT string) seen last time.
+    Returns (rows, outcome), rows newest first. outcome["reason"] is
+    "known" or "cutoff" when the page reached the known message; anything
+    else ("max_loops", "end") means more arrived than fit in one page and
+    the rows do not join up with what was seen before.
+    """
+    outcome = {}
+    rows = []
+    pages = iter_stream(target_url, headers, datetime.strptime(newest_date, DATE_FORMAT),
+                        stop_at_stream_id=newest_stream_id, max_loops=1, outcome=outcome)
+    for page_rows, _ in pages:
+        rows.extend(page_rows)
+    return rows, outcome
+
+
+_DONE = object()
+
+
+def prefetch(pages, depth=PREFETCH_PAGES):
+    """
+    Runs a page iterator (iter_stream, iter_ticker) on a background thread
+    so the next page is requested while the caller works on the current one.
+
+    At most `depth` pages wait in the queue; the fetcher blocks beyond that,
+    so a slow consumer is never outrun. Pages arrive in order and the
+    iterator's own stop rules (cutoff, known message) are untouched; its
+    `outcome`/`result` dicts are complete once this generator is exhausted.
+    Errors in the fetcher are raised here. Stopping early makes the
+    fetcher quit after its current request.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        error = None
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+        except BaseException as e:
+            error = e
+        put((_DONE, error))
+
+    threading.Thread(target=produce, name="page-prefetch", daemon=True).start()
+    try:
+        while True:
+            page, error = items.get()
+            if page is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield page
+    finally:
+        stop.set()
+
+
+def walk_stream(target_url, headers, cutoff_date, start_cursor=None, stop_at_stream_id=None,
+                stop_before_date=None, max_loops=50000, on_page=None):
+    """
+    Collects every row from iter_stream into one list.
+    `on_page(page_number, page_rows, stop_reason)` runs after every page.
+    Returns (rows, outcome).
+    """
+    rows = []
+    outcome = {}
+    pages = iter_stream(target_url, headers, cutoff_date, start_cursor=start_cursor,
+                        stop_at_stream_id=stop_at_stream_id, stop_before_date=stop_before_date,
+                        max_loops=max_loops, outcome=outcome)
+    for i, (page_rows, stop_reason) in enumerate(pages):
+        if on_page:
+            on_page(i, page_rows, stop_reason)
+        rows.extend(page_rows)
+    return rows, outcome
+
+
+def iter_ticker(target_url, headers, cutoff_date, state=None, max_loops=50000, result=None):
+    """
+    Yields (page_rows, stop_reason) for every stream message newer than `cutoff_date`.
+
+    Without a previous scan `state` this is a full scan. With one, paging
+    from the head stops at the newest message seen last time, and older
+    pages are only fetched (from the stored tail cursor) when the stored
+    range does not reach back to the cutoff yet. A walk that stopped at the
+    cutoff records it as "reached_cutoff", so later scans with the same or
+    a newer cutoff skip the tail even though its oldest row is newer.
+    Once exhausted, `result` (a dict) holds "state" (the new scan state, or
+    None when the old one should be kept), "outcome" of the last walk and
+    "malformed", the number of unparseable messages across all walks.
+    """
+    if result is None:
+        result = {}
+    outcome = {}
+    seen = {"newest": None, "oldest_date": None, "malformed": 0}
+
+    def track(walk_outcome, **walk_args):
+        for page_rows, stop_reason in iter_stream(target_url, headers, cutoff_date, max_loops=max_loops,
+                                                  outcome=walk_outcome, **walk_args):
+            if page_rows:
+                if seen["newest"] is None:
+                    seen["newest"] = (str(page_rows[0]['stream_id']), page_rows[0]['date'])
+                seen["oldest_date"] = page_rows[-1]['date']
+            yield page_rows, stop_reason
+        seen["malformed"] += walk_outcome["malformed"]
+        result["malformed"] = seen["malformed"]
+
+    def fresh_state():
+        if seen["newest"] is None:
+            return None
+        return {
+            "newest_stream_id": seen["newest"][0],
+            "newest_date": seen["newest"][1],
+            "oldest_date": seen["oldest_date"],
+            "tail_cursor": outcome["tail_cursor"],
+            "exhausted": outcome["reason"] == "end",
+            "reached_cutoff": reached_cutoff()
+        }
+
+    def reached_cutoff():
+        return cutoff_date.strftime(DATE_FORMAT) if outcome["reason"] == "cutoff" else None
+
+    result.update(state=None, outcome=outcome, malformed=0)
+
+    if state is None:
+        yield from track(outcome)
+        result["state"] = fresh_state()
+        return
+
+    newest_date = datetime.strptime(state["newest_date"], DATE_FORMAT)
+    yield from track(outcome, stop_at_stream_id=state["newest_stream_id"], stop_before_date=newest_date)
+
+    if outcome["reason"] == "cutoff":
+        # Everything stored is older than the window; start a new covered range.
+        result["state"] = fresh_state()
+        return
+    if outcome["reason"] not in ("known", "end"):
+        # The head was not joined to the stored range, so keep the old state.
+        return
+
+    new_state = dict(state)
+    if seen["newest"] is not None:
+        new_state["newest_stream_id"], new_state["newest_date"] = seen["newest"]
+    result["state"] = new_state
+
+    oldest_date = datetime.strptime(state["oldest_date"], DATE_FORMAT)
+    if state["exhausted"] or oldest_date <= cutoff_date:
+        return
+    if state.get("reached_cutoff") and datetime.strptime(state["reached_cutoff"], DATE_FORMAT) <= cutoff_date:
+        return
+
+    seen["oldest_date"] = None
+    outcome = {}
+    result["outcome"] = outcome
+    yield from track(outcome, start_cursor=state["tail_cursor"])
+    if seen["oldest_date"] is not None:
+        new_state["oldest_date"] = min(state["oldest_date"], seen["oldest_date"])
+    new_state["tail_cursor"] = outcome["tail_cursor"]
+    new_state["exhausted"] = outcome["reason"] == "end"
+    new_state["reached_cutoff"] = reached_cutoff()
+
+
+def scrape_ticker(target_url, headers, cutoff_date, state=None, max_loops=50000, on_page=None):
+    """
+    Collects everything iter_ticker yields into one list.
+    `on_page(page_number, page_rows, stop_reason)` runs after every page.
+    Returns (rows, new_state, outcome).
+    """
+    rows = []
+    result = {}
+    pages = iter_ticker(target_url, headers, cutoff_date, state=state, max_loops=max_loops, result=result)
+    for i, (page_rows, stop_reason) in enumerate(pages):
+        if on_page:
+            on_page(i, page_rows, stop_reason)
+        rows.extend(page_rows)
+    return rows, result["state"], result["outcome"]
+
+
+class SentimentTally:
+    """
+    Running counts of AI sentiment and target-price signals, so summaries
+    never need the full row set in memory.
+
+    With a near_duplicates.NearDuplicateIndex as `near_dupes`, each cluster
+    of near-identical messages (copy-paste spam, cross-posts) is counted
+    once, by its first row; 'messages' still counts every row.
+    """
+
+    def __init__(self, near_dupes=None):
+        self.total = 0
+        self.messages = 0
+        self.counts = {"BULLISH 🚀": 0, "BEARISH 🔻": 0, "NEUTRAL 😐": 0}
+        self.targets = {"bullish_target": 0, "bearish_target": 0}
+        self.near_dupes = near_dupes
+        self._seen_clusters = set()
+
+    def add(self, rows):
+        self.messages += len(rows)
+        if self.near_dupes is not None:
+            clusters = self.near_dupes.assign([row['content'] or "" for row in rows])
+            first_rows = []
+            for row, cluster in zip(rows, clusters):
+                if cluster not in self._seen_clusters:
+                    self._seen_clusters.add(cluster)
+                    first_rows.append(row)
+            rows = first_rows
+
+        for row in rows:
+            self.total += 1
+            if row['ai_sentiment'] in self.counts:
+                self.counts[row['ai_sentiment']] += 1
+            if row['prediction_signal'] in self.targets:
+                self.targets[row['prediction_signal']] += 1
+
+    def summary(self):
+        """
+        Percentages are of all counted rows (one per cluster when collapsing
+        near-duplicates); 'dominant' is the most common AI label.
+        """
+        total = self.total
+        pcts = {label: (count / total) * 100 if total > 0 else 0 for label, count in self.counts.items()}
+        return {
+            "total": total,
+            "messages": self.messages,
+            "bullish": self.counts["BULLISH 🚀"],
+            "bearish": self.counts["BEARISH 🔻"],
+            "neutral": self.counts["NEUTRAL 😐"],
+            "bullish_pct": pcts["BULLISH 🚀"],
+            "bearish_pct": pcts["BEARISH 🔻"],
+            "neutral_pct": pcts["NEUTRAL 😐"],
+            "bullish_target": self.targets["bullish_target"],
+            "bearish_target": self.targets["bearish_target"],
+            "dominant": max(pcts, key=pcts.get)
+        }
+
+
+def summarize_rows(rows):
+    """
+    Counts AI sentiment and target-price signals over classified rows.
+    """
+    tally = SentimentTally()
+    tally.add(rows)
+    return tally.summary()
+
+
+class ChunkedCsvWriter:
+    """
+    Appends rows to a CSV file in chunks of `chunk_rows`, flushing each
+    chunk to disk so a crashed run keeps everything written so far.
+    Raises PermissionError on open if the file is locked (e.g. open in Excel).
+    """
+
+    def __init__(self, filename, columns, chunk_rows=500):
+        self.filename = filename
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self._buffer = []
+        self._file = open(filename, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        with metrics.stage("csv_write"):
+            if self._buffer:
+                self._writer.writerows(self._buffer)
+                self.rows_written += len(self._buffer)
+                metrics.inc("rows_written_total", len(self._buffer))
+                self._buffer = []
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
@@ -0,0 +1,239 @@
+import os
+import sqlite3
+import threading
+import metrics
+import sentiment_engine
+
+STORE_PATH = os.path.join("data", "stream_store.db")
+
+COLUMNS = [
+    "stream_id", "date", "username", "content", "sentiment_label",
+    "prediction_signal", "ai_sentiment", "ai_confidence", "likes", "replies"
+]
+
+BUCKET_COLUMNS = [
+    "messages", "bullish", "bearish", "neutral", "likes", "replies", "bullish_target", "bearish_target"
+]
+
+_HOUR = "substr(date, 1, 13) || ':00:00'"
+_BUCKET_SELECT = f"""
+    SELECT ticker, {_HOUR} AS hour, COUNT(*),
+           SUM(ai_sentiment = ?), SUM(ai_sentiment = ?), SUM(ai_sentiment = ?),
+           SUM(CAST(likes AS INTEGER)), SUM(CAST(replies AS INTEGER)),
+           SUM(prediction_signal = 'bullish_target'), SUM(prediction_signal = 'bearish_target')
+    FROM messages
+    WHERE content IS NOT NULL AND content != ''
+"""
+# Hour (local time) the exchange closes; see bucket_series(period="session").
+SESSION_CLOSE_HOUR = 16
+
+_BUCKET_LABELS = [sentiment_engine.BULLISH, sentiment_engine.BEARISH, sentiment_engine.NEUTRAL]
+
+
+class StreamStore:
+    """
+    Per-ticker message history plus the scan state needed to resume.
+
+    The state describes one contiguous covered range of the stream:
+    the newest stream_id seen, the date of the oldest stored message, and
+    the cursor of the page holding it (None once the stream is exhausted)
+    and, if a walk stopped at a cutoff, that cutoff date.
+
+    Alongside the messages it keeps an hourly index (sentiment_buckets):
+    per ticker and hour, the counts of AI labels, likes, replies and
+    target-price signals, refreshed for every hour a save touches. Window
+    and heatmap queries sum buckets instead of reading messages.
+    """
+
+    def __init__(self, db_path=STORE_PATH):
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS messages (
+                ticker TEXT NOT NULL,
+                {", ".join(f"{col} {'REAL' if col == 'ai_confidence' else 'TEXT'}" for col in COLUMNS)},
+                PRIMARY KEY (ticker, stream_id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_date ON messages (ticker, date)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS scan_state (
+                ticker TEXT PRIMARY KEY,
+                newest_stream_id TEXT,
+                newest_date TEXT,
+                oldest_date TEXT,
+                tail_cursor TEXT,
+                exhausted INTEGER DEFAULT 0,
+                reached_cutoff TEXT
+            )
+        """)
+        state_columns = [row[1] for row in self._conn.execute("PRAGMA table_info(scan_state)")]
+        if "reached_cutoff" not in state_columns:
+            self._conn.execute("ALTER TABLE scan_state ADD COLUMN reached_cutoff TEXT")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS sentiment_buckets (
+                ticker TEXT NOT NULL,
+                hour TEXT NOT NULL,
+                {", ".join(f"{col} INTEGER" for col in BUCKET_COLUMNS)},
+                PRIMARY KEY (ticker, hour)
+            )
+        """)
+        # Stores created before the index existed are indexed once.
+        if self._conn.execute("SELECT 1 FROM sentiment_buckets LIMIT 1").fetchone() is None:
+            self._conn.execute(f"INSERT OR REPLACE INTO sentiment_buckets {_BUCKET_SELECT} GROUP BY ticker, hour",
+                               _BUCKET_LABELS)
+        self._conn.commit()
+
+    def get_state(self, ticker):
+        """
+        Returns the scan state of `ticker` as a dict, or None if it was never scanned.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT newest_stream_id, newest_date, oldest_date, tail_cursor, exhausted, reached_cutoff "
+                "FROM scan_state WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "newest_stream_id": row[0],
+            "newest_date": row[1],
+            "oldest_date": row[2],
+            "tail_cursor": row[3],
+            "exhausted": bool(row[4]),
+            "reached_cutoff": row[5]
+        }
+
+    def set_state(self, ticker, state):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scan_state VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ticker, state["newest_stream_id"], state["newest_date"], state["oldest_date"],
+                 state["tail_cursor"], int(state["exhausted"]), state.get("reached_cutoff"))
+            )
+            self._conn.commit()
+
+    def save_messages(self, ticker, rows):
+        """
+        Inserts or updates message rows for `ticker`.
+        """
+        values = [
+            (ticker,) + tuple(str(row[col]) if col == "stream_id" else row.get(col) for col in COLUMNS)
+            for row in rows if row.get("stream_id") is not None
+        ]
+        if not values:
+            return
+        marks = ",".join("?" * (len(COLUMNS) + 1))
+        hours = sorted({row["date"][:13] for row in rows if row.get("date")})
+        with self._lock, metrics.stage("store_write"):
+            self._conn.executemany(f"INSERT OR REPLACE INTO messages VALUES ({marks})", values)
+            for start in range(0, len(hours), 500):
+                chunk = hours[start:start + 500]
+                # The BETWEEN bounds let SQLite use idx_messages_date.
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO sentiment_buckets {_BUCKET_SELECT} "
+                    f"AND ticker = ? AND date BETWEEN ? AND ? "
+                    f"AND substr(date, 1, 13) IN ({','.join('?' * len(chunk))}) GROUP BY ticker, hour",
+                    _BUCKET_LABELS + [ticker, chunk[0] + ":00:00", chunk[-1] + ":59:59"] + chunk
+                )
+            self._conn.commit()
+
+    def _window_query(self, ticker, since):
+        query = f"SELECT {', '.join(COLUMNS)} FROM messages WHERE ticker = ?"
+        params = [ticker]
+        if since is not None:
+            query += " AND date >= ?"
+            params.append(since.strftime('%Y-%m-%d %H:%M:%S'))
+        return query + " ORDER BY date DESC", params
+
+    def load_messages(self, ticker, since=None):
+        """
+        Returns stored rows for `ticker`, newest first.
+        `since` is a datetime; older messages are left out.
+        """
+        query, params = self._window_query(ticker, since)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def iter_messages(self, ticker, since=None, chunk_size=1000):
+        """
+        Same rows as load_messages, yielded in lists of `chunk_size`
+        so large histories can be exported with flat memory.
+        """
+        query, params = self._window_query(ticker, since)
+        cursor = self._conn.cursor()
+        with self._lock:
+            cursor.execute(query, params)
+        while True:
+            with self._lock:
+                chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield [dict(zip(COLUMNS, row)) for row in chunk]
+
+    def _bucket_query(self, tickers, since, until, period):
+        query = (f"SELECT ticker, {period} AS period, "
+                 f"{', '.join(f'SUM({col})' for col in BUCKET_COLUMNS)} "
+                 f"FROM sentiment_buckets WHERE ticker IN ({','.join('?' * len(tickers))})")
+        params = list(tickers)
+        if since is not None:
+            query += " AND hour >= ?"
+            params.append(since.strftime('%Y-%m-%d %H:00:00'))
+        if until is not None:
+            query += " AND hour < ?"
+            params.append(until.strftime('%Y-%m-%d %H:00:00'))
+        with self._lock:
+            rows = self._conn.execute(query + " GROUP BY ticker, period ORDER BY ticker, period", params).fetchall()
+        return [
+            {"ticker": row[0], "period": row[1], **{col: row[i + 2] or 0 for i, col in enumerate(BUCKET_COLUMNS)}}
+            for row in rows
+        ]
+
+    def window_summary(self, ticker, since=None, until=None):
+        """
+        Sums the hourly buckets of `ticker` between `since` and `until`
+        (datetimes, aligned down to the hour; None = unbounded).
+        Returns a dict with one total per BUCKET_COLUMNS entry.
+        """
+        rows = self._bucket_query([ticker], since, until, "ticker")
+        if not rows:
+            return {col: 0 for col in BUCKET_COLUMNS}
+        return {col: rows[0][col] for col in BUCKET_COLUMNS}
+
+    def bucket_series(self, tickers, since=None, until=None, period="hour"):
+        """
+        Per-ticker totals for every hour (period="hour") or day ("day")
+        with stored messages, oldest first, as dicts with "ticker",
+        "period" and the BUCKET_COLUMNS totals. Meant for heatmaps.
+
+        period="session" groups by calendar day too, but hours from
+        SESSION_CLOSE_HOUR on count toward the next day, so each day only
+        holds messages posted before that day's close.
+        """
+        if not tickers:
+            return []
+        if period == "hour":
+            expr = "hour"
+        elif period == "session":
+            expr = f"date(hour, '+{24 - SESSION_CLOSE_HOUR} hours')"
+        else:
+            expr = "substr(hour, 1, 10)"
+        return self._bucket_query(tickers, since, until, expr)
+
+    def stored_tickers(self):
+        """
+        Returns the tickers with indexed messages.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT ticker FROM sentiment_buckets ORDER BY ticker").fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
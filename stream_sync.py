@@ -0,0 +1,84 @@
+import data_layer
+import near_duplicates
+import sentiment_engine
+import stream_scraper
+
+DASHBOARD_MAX_PAGES = 20
+
+
+def label_pages(pages, classifier, cache=None, near_dupes=None, memo=sentiment_engine.default_memo):
+    """
+    Labels every (page_rows, stop_reason) page of a page iterator
+    (iter_stream, iter_ticker) in place and yields it on. The iterator runs
+    under stream_scraper.prefetch, so the next page is being fetched while
+    this one is classified. Without a classifier pages pass through as is.
+    """
+    for page_rows, stop_reason in stream_scraper.prefetch(pages):
+        if page_rows and classifier:
+            sentiment_engine.label_rows(classifier, page_rows, cache=cache, memo=memo, near_dupes=near_dupes)
+        yield page_rows, stop_reason
+
+
+def sync_ticker(store, ticker, target_url, headers, cutoff_date, classifier=None, cache=None,
+                max_loops=DASHBOARD_MAX_PAGES):
+    """
+    Brings the stored stream of `ticker` up to date back to `cutoff_date`:
+    new pages are labeled and saved as they arrive, and the scan state moves
+    on once the walk is over. Returns the walk's outcome dict, with
+    "malformed" added; the state is left alone when upstream rejected the
+    token.
+    """
+    # Near-identical spam in the window is classified once, through one representative.
+    near_dupes = near_duplicates.NearDuplicateIndex()
+    result = {}
+    try:
+        pages = stream_scraper.iter_ticker(target_url, headers, cutoff_date, state=store.get_state(ticker),
+                                           max_loops=max_loops, result=result)
+        for page_rows, _ in label_pages(pages, classifier, cache=cache, near_dupes=near_dupes):
+            store.save_messages(ticker, page_rows)
+        new_state, outcome = result["state"], dict(result["outcome"])
+    except Exception as e:
+        new_state, outcome = None, {"reason": "error", "error": e, "status_code": None}
+    outcome["malformed"] = result.get("malformed", 0)
+
+    if new_state and outcome["status_code"] not in data_layer.DENIED_STATUS:
+        store.set_state(ticker, new_state)
+    return outcome
+
+
+def label_window(store, ticker, cutoff_date, classifier, cache=None):
+    """
+    Labels the stored messages of `ticker` since `cutoff_date` that were
+    saved before a classifier was available. Returns how many were labeled.
+    """
+    unlabeled = [row for row in store.load_messages(ticker, since=cutoff_date)
+                 if row['content'] and row['ai_sentiment'] is None]
+    if unlabeled:
+        sentiment_engine.label_rows(classifier, unlabeled, cache=cache,
+                                    near_dupes=near_duplicates.NearDuplicateIndex())
+        store.save_messages(ticker, unlabeled)
+    return len(unlabeled)
+
+
+def window_counts(store, ticker, cutoff_date, count_clusters_once=False):
+    """
+    (bullish, bearish, neutral) AI label counts of the stored messages since
+    `cutoff_date`. With `count_clusters_once`, each cluster of near-identical
+    messages counts once.
+    """
+    if not count_clusters_once:
+        # Summed from the store's hourly index (window aligned down to the hour).
+        window = store.window_summary(ticker, since=cutoff_date)
+        return window["bullish"], window["bearish"], window["neutral"]
+
+    labels = (sentiment_engine.BULLISH, sentiment_engine.BEARISH, sentiment_engine.NEUTRAL)
+    labeled = [row for row in store.load_messages(ticker, since=cutoff_date)
+               if row['content'] and row['ai_sentiment'] in labels]
+    if labeled:
+        clusters = near_duplicates.NearDuplicateIndex().assign([row['content'] for row in labeled])
+        first_rows = {}
+        for row, cluster in zip(labeled, clusters):
+            first_rows.setdefault(cluster, row)
+        labeled = list(first_rows.values())
+    sentiments = [row['ai_sentiment'] for row in labeled]
+    return tuple(sentiments.count(label) for label in labels)